@@ -1,134 +1,70 @@
-import colorsys
+import os
 import random
-from typing import Tuple
+import sys
+import time
+from dataclasses import replace
+from typing import Optional
 import numpy as np
-from dataclasses import dataclass
-from abc import ABC, abstractmethod
+
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    # Offline rendering without Qt, e.g. on render servers: dispatched before
+    # the GUI imports below so PyQt5 and vispy need not be installed
+    import offline_render
+    offline_render.main([arg for arg in sys.argv[1:] if arg != '--headless'])
+    sys.exit()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
                            QSlider, QHBoxLayout, QPushButton, QLabel)
 from PyQt5.QtCore import Qt, QTimer
 from vispy import scene
+from attractors import AttractorSystem, ODEAttractor, DEFAULT_PARAMS, create_attractor
+from frame_profiler import FrameProfiler
+from screening import find_interesting_params
+from simulation_worker import SimulationWorker
+from trail_visual import LODTrail
+from trajectory_store import TrajectoryRecorder, load_attractor
 
-from collections import deque
-
-@dataclass
-class AttractorParams:
-    params: Tuple[float, ...]
-    name: str
-    dimension: int = 3
-    trail_length: int = 1000  # How many previous points to show
-
-class AttractorSystem(ABC):
-    def __init__(self, params: AttractorParams, dt: float = 0.01):
-        self.params = params
-        self.dt = dt
-        self.current_state = np.random.uniform(-0.1, 0.1, size=params.dimension)
-        self.trail = deque(maxlen=params.trail_length)
-        self.trail.append(self.current_state.copy())
-    
-    @abstractmethod
-    def step(self) -> np.ndarray:
-        pass
-
-class CliffordAttractor(AttractorSystem):
-    def step(self) -> np.ndarray:
-        x, y = self.current_state
-        a, b, c, d = self.params.params
-
-        self.current_state[0] = np.sin(a * y) + c * np.cos(a * x)
-        self.current_state[1] = np.sin(b * x) + d * np.cos(b * y)
-        self.trail.append(self.current_state.copy())
-        return self.current_state               
-
-class DeJongAttractor(AttractorSystem):
-    def step(self) -> np.ndarray:
-        x, y = self.current_state
-        a, b, c, d = self.params.params
+# The trail slider is logarithmic between these lengths
+MIN_TRAIL_LENGTH = 100
+MAX_TRAIL_LENGTH = 2000000
+TRAIL_SLIDER_STEPS = 1000
+# Trail vertices drawn per screen pixel at the initial zoom
+LOD_VERTICES_PER_PIXEL = 0.25
 
-        self.current_state[0] = np.sin(a * y) - np.cos(b * x)
-        self.current_state[1] = np.sin(c * x) - np.cos(d * y)
-        self.trail.append(self.current_state.copy())
-        return self.current_state
 
-class AizawaAttractor(AttractorSystem):
-   def step(self) -> np.ndarray:
-      def derivatives(s: np.ndarray) -> np.ndarray:
-          x, y, z = s
-          a, b, c, d, e = self.params.params
-          return np.array([
-              (z - b) * x - d * y,
-              d * x + (z - b) * y,
-              c + a * z - (z ** 3) / 3 - (x ** 2 + y ** 2) * (1 + e * z) + 0.1 * z * x ** 3
-          ])
-      # RK4 integration
-      k1 = derivatives(self.current_state)
-      k2 = derivatives(self.current_state + 0.5 * self.dt * k1)
-      k3 = derivatives(self.current_state + 0.5 * self.dt * k2)
-      k4 = derivatives(self.current_state + self.dt * k3)
-      # Update state
-      self.current_state += (self.dt / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
-      self.trail.append(self.current_state.copy())
-      return self.current_state
+def trail_length_from_slider(value: int) -> int:
+    return int(round(MIN_TRAIL_LENGTH * (MAX_TRAIL_LENGTH / MIN_TRAIL_LENGTH) ** (value / TRAIL_SLIDER_STEPS)))
 
-"""    
-class ThomasAttractor(AttractorSystem):
-    def step(self) -> np.ndarray:
-        def derivatives(s: np.ndarray) -> np.ndarray:
-            x, y, z = s
-            b = self.params.params
-            return np.array([
-                np.sin(y) - b * x,
-                np.sin(z) - b * y,
-                np.sin(x) - b * z
-            ])
-        # RK4 integration
-        k1 = derivatives(self.current_state)
-        k2 = derivatives(self.current_state + 0.5 * self.dt * k1)
-        k3 = derivatives(self.current_state + 0.5 * self.dt * k2)
-        k4 = derivatives(self.current_state + self.dt * k3)
 
-        # Update state
-        self.current_state += (self.dt / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
-        self.trail.append(self.current_state.copy())
+def slider_from_trail_length(length: int) -> int:
+    return int(round(TRAIL_SLIDER_STEPS * np.log(length / MIN_TRAIL_LENGTH) / np.log(MAX_TRAIL_LENGTH / MIN_TRAIL_LENGTH)))
 
-        return self.current_state
-"""
-
-class LorenzAttractor(AttractorSystem):
-    def step(self) -> np.ndarray:
-        def derivatives(s: np.ndarray) -> np.ndarray:
-            x, y, z = s
-            sigma, rho, beta = self.params.params
-            return np.array([
-                sigma * (y - x),
-                x * (rho - z) - y,
-                x * y - beta * z
-            ])
-        
-        # RK4 integration
-        k1 = derivatives(self.current_state)
-        k2 = derivatives(self.current_state + 0.5 * self.dt * k1)
-        k3 = derivatives(self.current_state + 0.5 * self.dt * k2)
-        k4 = derivatives(self.current_state + self.dt * k3)
-        
-        # Update state
-        self.current_state += (self.dt / 6.0) * (k1 + 2*k2 + 2*k3 + k4)
-        self.trail.append(self.current_state.copy())
-        
-        return self.current_state
 
 class AttractorVisualizer(QMainWindow):
-    def __init__(self, attractor: AttractorSystem):
+    def __init__(self, attractor: AttractorSystem, ensemble_size: int = 100000,
+                 recorder: Optional[TrajectoryRecorder] = None, profile_path: Optional[str] = None):
         super().__init__()
         self.attractor = attractor
+        # Stage timings for the HUD; with a profile_path the trace is saved on exit
+        # and draws wait for the GPU, so the draw stage includes GPU time
+        self.profiler = FrameProfiler()
+        self.profile_path = profile_path
+        self._draw_start = 0.0
+        self._hud_updated = 0.0
+        self.ensemble_size = ensemble_size
+        self.dust_on = False
         self.animation_speed = 1
         self.rotation_speed = 1.0
         self.trail_color_shift = 0.0
         self.paused = False
+        # The attractor is stepped (and recorded) on a worker thread, the GUI keeps the trail
+        self.worker = SimulationWorker(attractor, steps_per_tick=self.animation_speed, recorder=recorder)
+        self.generation = self.worker.generation
         self.init_ui()
+        self.worker.start()
         
     def init_ui(self):
-        self.setWindowTitle('Strange Attractor Evolution')
+        self.setWindowTitle(f'Strange Attractor Evolution ({self.attractor.backend} backend)')
         self.setGeometry(1300, 700, 1000, 800)
         
         # Main layout
@@ -147,7 +83,10 @@ class AttractorVisualizer(QMainWindow):
         self.view.camera.distance = 80 # Zoom out
         
         # Line plot for the trail
-        self.line = scene.visuals.Line(parent=self.view.scene)
+        self.initial_scale = None  # camera scale at the first frame, zoom is relative to it
+        self.line = LODTrail(self.attractor.trail.capacity, self.attractor.params.dimension,
+                             budget=self.point_budget(), parent=self.view.scene)
+        self.line.reset(self.attractor.trail.view())
         self.show_lines = True
         
         # Current point marker
@@ -155,6 +94,18 @@ class AttractorVisualizer(QMainWindow):
         self.scatter = scene.visuals.Markers(parent=self.view.scene)
         self.points_show = False
         
+        # Frame timing overlay, in canvas pixels
+        self.hud = scene.visuals.Text('', parent=self.canvas.scene, color='white', font_size=8,
+                                      anchor_x='left', anchor_y='top', pos=(10, 10))
+        self.hud.visible = self.profile_path is not None
+        self.canvas.events.draw.connect(self.draw_started, position='first')
+        self.canvas.events.draw.connect(self.draw_finished, position='last')
+        
+        # Ensemble point cloud ("dust")
+        self.cloud = scene.visuals.Markers(parent=self.view.scene)
+        self.cloud.set_gl_state('additive', depth_test=False)
+        self.cloud.visible = False
+        
         # Controls
         control_layout = QHBoxLayout()
         
@@ -174,9 +125,9 @@ class AttractorVisualizer(QMainWindow):
         trail_layout = QVBoxLayout()
         trail_label = QLabel("Trail Length")
         self.trail_slider = QSlider(Qt.Horizontal)
-        self.trail_slider.setMinimum(100)
-        self.trail_slider.setMaximum(5000)
-        self.trail_slider.setValue(1000)
+        self.trail_slider.setMinimum(0)
+        self.trail_slider.setMaximum(TRAIL_SLIDER_STEPS)
+        self.trail_slider.setValue(slider_from_trail_length(1000))
         self.trail_slider.valueChanged.connect(self.update_trail_length)
         trail_layout.addWidget(trail_label)
         trail_layout.addWidget(self.trail_slider)
@@ -201,6 +152,24 @@ class AttractorVisualizer(QMainWindow):
         self.clear_button = QPushButton("Clear")
         self.clear_button.clicked.connect(self.clear_lines)
         control_layout.addWidget(self.clear_button)
+
+        # Ensemble dust button
+        self.dust_button = QPushButton("Show dust")
+        self.dust_button.clicked.connect(self.toggle_dust)
+        control_layout.addWidget(self.dust_button)
+
+        # Adaptive step size button (continuous attractors only)
+        self.adaptive_button = QPushButton("Adaptive steps")
+        self.adaptive_button.setCheckable(True)
+        self.adaptive_button.setChecked(getattr(self.attractor, 'adaptive', False))  # e.g. a resumed recording
+        self.adaptive_button.setEnabled(isinstance(self.attractor, ODEAttractor))
+        self.adaptive_button.clicked.connect(self.toggle_adaptive)
+        control_layout.addWidget(self.adaptive_button)
+
+        # Frame timing overlay button
+        self.hud_button = QPushButton("Hide HUD" if self.hud.visible else "Show HUD")
+        self.hud_button.clicked.connect(self.toggle_hud)
+        control_layout.addWidget(self.hud_button)
         
         main_layout.addLayout(control_layout)
         
@@ -213,35 +182,43 @@ class AttractorVisualizer(QMainWindow):
         if self.paused:
             return
             
-        # Update system multiple times per frame based on speed
-        for _ in range(self.animation_speed):
-            self.attractor.step()
-        
-        # Update visualization
-        trail_points = np.array(list(self.attractor.trail))
-        
-        # Generate colors for the trail (newer points are brighter)
-        n_points = len(trail_points)
-        color_values = np.linspace(0.2, 1.0, n_points)
-        colors = np.zeros((n_points, 4))
+        profiler = self.profiler
+        # Collect the points the simulation thread produced since the last frame
+        with profiler.stage('take'):
+            snapshot = self.worker.take()
+            new_points = snapshot.points
+            if snapshot.generation != self.generation:
+                new_points = new_points[:0]  # from before a reset
+            elif snapshot.overflowed:
+                self.attractor.trail.clear()  # the GUI fell behind and points were dropped
+            self.attractor.trail.extend(new_points)
         
-        # Create rainbow trail effect
-        for i in range(n_points):
-            hue = (i / n_points + self.trail_color_shift) % 1.0
-            rgb = colorsys.hsv_to_rgb(hue, 0.8, color_values[i])
-            colors[i] = np.append(rgb, 1.0)  # Add alpha channel
+        # Update trail visualization: only the new points are uploaded,
+        # fading and hue cycling happen in the shader
+        with profiler.stage('trail'):
+            budget = self.point_budget()
+            if snapshot.overflowed or not self.line.budget / 2 <= budget <= self.line.budget * 2:
+                # Window resized or zoomed a lot: redistribute detail
+                self.line.reset(self.attractor.trail.view(), budget=budget)
+            else:
+                self.line.append(new_points)
+            self.line.set_shift(self.trail_color_shift)
+            self.line.visible = self.show_lines
         
-        # Update trail visualization
-        self.line.set_data(pos=trail_points, color=colors)
-        self.line.visible = self.show_lines
+        # Update ensemble point cloud
+        if self.dust_on and snapshot.dust is not None:
+            with profiler.stage('dust'):
+                self.cloud.set_data(snapshot.dust, edge_width=0,
+                                    face_color=(1.0, 0.8, 0.6, 0.05), size=1)
         
         # Update current point
-        self.current_point.set_data(
-            pos=trail_points[-1:],
-            edge_color='white',
-            face_color='white',
-            size=10
-        )
+        with profiler.stage('markers'):
+            self.current_point.set_data(
+                pos=self.attractor.trail.view()[-1:],
+                edge_color='white',
+                face_color='white',
+                size=10
+            )
         
         # Rotate view
         if self.attractor.params.dimension == 3:
@@ -250,35 +227,48 @@ class AttractorVisualizer(QMainWindow):
             self.view.camera.roll += self.rotation_speed * 0.1 # Rotate around the x
         
         self.trail_color_shift = (self.trail_color_shift + 0.001) % 1.0
+
+        profiler.end_frame(steps=len(new_points), points=self.line.drawn_vertices,
+                           trail=len(self.attractor.trail))
+        if self.hud.visible and time.perf_counter() - self._hud_updated > 0.25:
+            self.hud.text = profiler.hud_text({
+                'steps/s': f"{profiler.rate('steps'):,.0f}",
+                'points drawn': f"{profiler.latest('points'):,} of {profiler.latest('trail'):,}",
+                'stage': "p50 / p95 / p99",
+            })
+            self._hud_updated = time.perf_counter()
         
         self.canvas.update()
         
     def update_speed(self):
-        self.animation_speed = self.speed_slider.value() // 10
+        self.animation_speed = self.speed_slider.value()
+        self.worker.set_speed(self.animation_speed)
         
     def update_trail_length(self):
-        new_length = self.trail_slider.value()
-        old_trail = list(self.attractor.trail)
-        self.attractor.trail = deque(old_trail[-new_length:], maxlen=new_length)
+        self.attractor.trail.resize(trail_length_from_slider(self.trail_slider.value()))
+        self.line.reset(self.attractor.trail.view(), trail_length=self.attractor.trail.capacity)
+        self.worker.set_trail_length(self.attractor.trail.capacity)
         
     def toggle_pause(self):
         self.paused = not self.paused
+        self.worker.set_paused(self.paused)
         self.pause_button.setText("Resume" if self.paused else "Pause")
         
     def reset_system(self):
-        self.attractor.current_state = np.random.uniform(-0.1, 0.1, 
-                                                       size=self.attractor.params.dimension)
+        state = np.random.uniform(-0.1, 0.1, size=self.attractor.params.dimension)
+        self.generation = self.worker.reset(state)
         self.attractor.trail.clear()
         if self.points_show:
-            self.scatter.set_data(self.attractor.current_state.reshape(1, -1), edge_color=(0.5, 0.5, 0.5, 0.7),
+            self.scatter.set_data(state.reshape(1, -1), edge_color=(0.5, 0.5, 0.5, 0.7),
                                    face_color=(0.5, 0.5, 0.5, 0.7), size=2)
         else:
-            self.scatter.set_data(self.attractor.current_state.reshape(1, -1), edge_color=(0, 0, 0, 0),
+            self.scatter.set_data(state.reshape(1, -1), edge_color=(0, 0, 0, 0),
                                    face_color=(0, 0, 0, 0), size=0)
-        self.attractor.trail.append(self.attractor.current_state.copy())
+        self.attractor.trail.append(state)
+        self.line.reset(self.attractor.trail.view())
 
     def show_points(self):
-        trail_points = np.array(list(self.attractor.trail))
+        trail_points = self.attractor.trail.view()
         if self.scatter_button.text() == "Show points":
             self.scatter_button.setText("Hide points")
             self.points_show = True
@@ -296,6 +286,7 @@ class AttractorVisualizer(QMainWindow):
         if self.clear_button.text() == "Clear":
             self.clear_button.setText("Show lines")
             self.attractor.trail.clear()
+            self.line.clear()
             self.show_lines = False
             
         else:
@@ -304,46 +295,82 @@ class AttractorVisualizer(QMainWindow):
             # self.update_system() # redraw with lines
         self.canvas.update()
 
+    def toggle_dust(self):
+        self.dust_on = not self.dust_on
+        self.worker.set_dust(self.ensemble_size if self.dust_on else None)
+        self.dust_button.setText("Hide dust" if self.dust_on else "Show dust")
+        self.cloud.visible = self.dust_on
+        self.canvas.update()
+
+    def camera_scale(self) -> Optional[float]:
+        camera = self.view.camera
+        if isinstance(camera, scene.cameras.PanZoomCamera):
+            return max(camera.rect.width, camera.rect.height)
+        return camera.scale_factor  # None until the camera has set its range
+
+    def point_budget(self) -> int:
+        """Trail vertices worth drawing for the canvas size and zoom"""
+        width, height = self.canvas.size
+        scale = self.camera_scale()
+        if self.initial_scale is None:
+            self.initial_scale = scale
+        zoom = self.initial_scale / scale if self.initial_scale and scale else 1.0
+        return int(np.clip(LOD_VERTICES_PER_PIXEL * width * height * zoom, 20000, 4000000))
+
+    def toggle_adaptive(self, checked: bool):
+        self.worker.set_adaptive(checked)
+
+    def draw_started(self, event):
+        self._draw_start = time.perf_counter()
+
+    def draw_finished(self, event):
+        if self.profile_path is not None:
+            self.canvas.context.finish()
+        # Counted in the frame that update_system closes next
+        self.profiler.add('draw', time.perf_counter() - self._draw_start)
+
+    def toggle_hud(self):
+        self.hud.visible = not self.hud.visible
+        self.hud_button.setText("Hide HUD" if self.hud.visible else "Show HUD")
+        self.canvas.update()
+
+    def closeEvent(self, event):
+        # Stopping the worker flushes the recorded points and checkpoints them
+        self.worker.stop()
+        if self.profile_path is not None:
+            self.profiler.dump(self.profile_path)
+            print(f"Frame trace saved to {self.profile_path}")
+        super().closeEvent(event)
+
 
 def main():
     app = QApplication([])
     
-    params = random.choice((AttractorParams(
-        params=(10.0, 28.0, 8/3),
-        name='Lorenz',
-        dimension=3 ,
-        trail_length=10000
-    ), (AttractorParams(
-        params=(-1.4, 1.6, 1.0, 0.7),
-        name='Clifford',
-        dimension=2,
-        trail_length=10000
-    )), (AttractorParams(
-        params=(-2.0, -2.0, -1.2, 2.0),
-        name='DeJong',
-        dimension=2,
-        trail_length=10000
-    )), (AttractorParams(
-        params=(0.95, 0.7, 0.6, 3.5, 0.25),
-        name='Aizawa',
-        dimension=3,
-        trail_length=10000
-    ))))
-    print(f"params: {params}")
-    if params.name == 'Clifford':
-        attractor = CliffordAttractor(params)
-    elif params.name == 'DeJong':
-        attractor = DeJongAttractor(params)
-    elif params.name == 'Aizawa':
-        attractor = AizawaAttractor(params)
+    args = sys.argv[1:]
+    # --record PATH stores the run in a trajectory file, resuming it if it exists
+    record_path = args[args.index('--record') + 1] if '--record' in args[:-1] else None
+    # --profile PATH shows the HUD and saves the frame trace (.json or .csv) on exit
+    profile_path = args[args.index('--profile') + 1] if '--profile' in args[:-1] else None
+    if record_path and os.path.exists(record_path):
+        attractor = load_attractor(record_path)
+        print(f"Resuming {record_path}")
     else:
-        attractor = LorenzAttractor(params)
+        params = random.choice(tuple(DEFAULT_PARAMS.values()))
+        if '--explore' in args:
+            # Random parameters instead of the defaults, screened to be chaotic and spread out
+            found = find_interesting_params(params.name)
+            if found:
+                params = replace(params, params=found[0])
+        attractor = create_attractor(params)
+    print(f"params: {attractor.params}")
+    print(f"integrator backend: {attractor.backend}")
+    recorder = TrajectoryRecorder(record_path, attractor) if record_path else None
     
     # Create and show visualizer
-    viz = AttractorVisualizer(attractor)
+    viz = AttractorVisualizer(attractor, recorder=recorder, profile_path=profile_path)
     viz.show()
     
     app.exec_()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,448 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import numpy as np
+from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from integrators import DEFAULT_BACKEND, check_backend, dopri5_kernel, map_kernels, rk4_kernels
+
+@dataclass
+class AttractorParams:
+    params: Tuple[float, ...]
+    name: str
+    dimension: int = 3
+    trail_length: int = 1000  # How many previous points to show
+
+class TrailBuffer:
+    """
+    Fixed-capacity ring buffer of trail points backed by one preallocated array
+
+    Every point is stored twice, at slot i and i + capacity, so the newest
+    len(self) points always form one contiguous slice and view() never copies.
+    """
+    def __init__(self, capacity: int, dimension: int):
+        self.dimension = dimension
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.empty((2 * capacity, self.dimension))
+        self._head = 0  # next slot to write, in [0, capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, point: np.ndarray):
+        self.extend(np.reshape(point, (1, self.dimension)))
+
+    def extend(self, points: np.ndarray):
+        points = np.asarray(points)[-self.capacity:]
+        n = len(points)
+        slots = (self._head + np.arange(n)) % self.capacity
+        self._data[slots] = points
+        self._data[slots + self.capacity] = points
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def view(self) -> np.ndarray:
+        """Oldest to newest points as an (n, dimension) view, overwritten by later appends"""
+        start = (self._head - self._size) % self.capacity
+        return self._data[start:start + self._size]
+
+    def resize(self, capacity: int):
+        recent = self.view()[-capacity:].copy()
+        self._allocate(capacity)
+        self.extend(recent)
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+class AttractorSystem(ABC):
+    # Whether advance_array uses the numba kernel on the numba backend. numpy's SIMD
+    # sin/cos step float32 arrays several times faster than numba's scalar libm calls
+    # (e.g. 132M vs 16M Clifford particle-steps/s), so attractors built on them keep numpy
+    jit_arrays = True
+
+    def __init__(self, params: AttractorParams, dt: float = 0.01, backend: Optional[str] = None):
+        self.params = params
+        self.dt = dt
+        self.backend = check_backend(backend or DEFAULT_BACKEND)
+        self.current_state = np.random.uniform(-0.1, 0.1, size=params.dimension)
+        self.trail = TrailBuffer(params.trail_length, params.dimension)
+        self.trail.append(self.current_state)
+        self._points = np.empty((0, params.dimension))  # reused output buffer for advance()
+
+    def step(self) -> np.ndarray:
+        self.advance(1)
+        return self.current_state
+
+    def advance(self, n_steps: int) -> np.ndarray:
+        """
+        Advance the system by n_steps at once and add the points to the trail
+
+        Returns:
+            (n_steps, dimension) array of the visited points. The array is a view
+            into a buffer reused by the next call, copy it if you need to keep it.
+        """
+        points = self.integrate(n_steps)
+        self.trail.extend(points)
+        return points
+
+    def integrate(self, n_steps: int) -> np.ndarray:
+        """Like advance() but leaves the trail alone, e.g. when another thread owns it"""
+        if self._points.shape[0] < n_steps:
+            self._points = np.empty((n_steps, self.params.dimension))
+        points = self._points[:n_steps]
+        if n_steps:
+            self._iterate(n_steps, points)
+            self.current_state[:] = points[-1]
+        return points
+
+    def _jit_params(self) -> Optional[Tuple[float, ...]]:
+        """Parameters as a tuple of floats for the numba kernels, None if numpy must be used"""
+        if self.backend != 'numba' or any(np.ndim(v) for v in self.params.params):
+            return None  # parameter arrays (batched candidates) only broadcast in numpy
+        return tuple(float(v) for v in self.params.params)
+
+    def _jit_array_params(self) -> Optional[Tuple[float, ...]]:
+        """Like _jit_params, for advance_array"""
+        return self._jit_params() if self.jit_arrays else None
+
+    @property
+    def array_backend(self) -> str:
+        """Backend advance_array actually runs on"""
+        return 'numba' if self._jit_array_params() is not None else 'numpy'
+
+    @abstractmethod
+    def _iterate(self, n_steps: int, out: np.ndarray):
+        """Run n_steps from current_state and write the visited points into out"""
+        pass
+
+    @abstractmethod
+    def advance_array(self, states: np.ndarray, n_steps: int = 1) -> None:
+        """Advance every row of an (N, dimension) array of states n_steps, in place"""
+        pass
+
+class MapAttractor(AttractorSystem):
+    """Discrete 2D attractor: each step applies the map once"""
+    @staticmethod
+    @abstractmethod
+    def equations(x, y, p, xp=math):
+        """
+        Apply the map with parameters p to x, y
+
+        Works on floats with xp=math (also when compiled by numba) and on
+        arrays with xp=np.
+        """
+        pass
+
+    def map(self, x, y, xp=math):
+        return self.equations(x, y, self.params.params, xp)
+
+    def _iterate(self, n_steps: int, out: np.ndarray):
+        x, y = (float(v) for v in self.current_state)
+        p = self._jit_params()
+        if p is not None:
+            iterate, _ = map_kernels(self.equations)
+            iterate(x, y, p, n_steps, out)
+            return
+        p = self.params.params
+        f = self.equations
+        points = []
+        for _ in range(n_steps):
+            x, y = f(x, y, p)
+            points.append((x, y))
+        out[:] = points
+
+    def advance_array(self, states: np.ndarray, n_steps: int = 1) -> None:
+        p = self._jit_array_params()
+        if p is not None:
+            _, iterate_array = map_kernels(self.equations)
+            iterate_array(states, p, n_steps)
+            return
+        x, y = states[:, 0].copy(), states[:, 1].copy()
+        for _ in range(n_steps):
+            x, y = self.map(x, y, xp=np)
+        states[:, 0] = x
+        states[:, 1] = y
+
+class ODEAttractor(AttractorSystem):
+    """
+    Continuous 3D attractor integrated with fixed step RK4
+
+    With adaptive set, single trajectories use an error-controlled
+    Dormand-Prince integrator instead (rtol/atol tolerances). Points are
+    still emitted every dt of time, or every arc_length along the curve if
+    that is set, so the trail stays evenly sampled while the integrator
+    takes long steps where the flow is smooth and short ones where it
+    bends. Ensembles (advance_array) always use fixed step RK4.
+    """
+    def __init__(self, params: AttractorParams, dt: float = 0.01, backend: Optional[str] = None,
+                 adaptive: bool = False, rtol: float = 1e-6, atol: float = 1e-9,
+                 arc_length: Optional[float] = None):
+        super().__init__(params, dt, backend)
+        self.adaptive = adaptive
+        self.rtol = rtol
+        self.atol = atol
+        self.arc_length = arc_length
+        self._step_size = dt  # last adaptive step size, carried over between calls
+
+    @staticmethod
+    @abstractmethod
+    def equations(x, y, z, p, xp=math):
+        """
+        Return (dx, dy, dz) at x, y, z for parameters p
+
+        Works on floats with xp=math (also when compiled by numba) and on
+        arrays with xp=np.
+        """
+        pass
+
+    def derivatives(self, x, y, z, xp=math):
+        return self.equations(x, y, z, self.params.params, xp)
+
+    def _iterate(self, n_steps: int, out: np.ndarray):
+        if self.adaptive:
+            self._iterate_adaptive(n_steps, out)
+            return
+        x, y, z = (float(v) for v in self.current_state)
+        dt = self.dt
+        p = self._jit_params()
+        if p is not None:
+            iterate, _ = rk4_kernels(self.equations)
+            iterate(x, y, z, p, dt, n_steps, out)
+            return
+        p = self.params.params
+        half_dt = 0.5 * dt
+        f = self.equations
+        points = []
+        for _ in range(n_steps):
+            # RK4 integration
+            k1x, k1y, k1z = f(x, y, z, p)
+            k2x, k2y, k2z = f(x + half_dt * k1x, y + half_dt * k1y, z + half_dt * k1z, p)
+            k3x, k3y, k3z = f(x + half_dt * k2x, y + half_dt * k2y, z + half_dt * k2z, p)
+            k4x, k4y, k4z = f(x + dt * k3x, y + dt * k3y, z + dt * k3z, p)
+            # Update state
+            x += (dt / 6.0) * (k1x + 2*k2x + 2*k3x + k4x)
+            y += (dt / 6.0) * (k1y + 2*k2y + 2*k3y + k4y)
+            z += (dt / 6.0) * (k1z + 2*k2z + 2*k3z + k4z)
+            points.append((x, y, z))
+        out[:] = points
+
+    def _iterate_adaptive(self, n_points: int, out: np.ndarray):
+        p = self._jit_params()
+        iterate = dopri5_kernel(self.equations, jit=p is not None)
+        by_arc_length = self.arc_length is not None
+        spacing = self.arc_length if by_arc_length else self.dt
+        self._step_size = iterate(self.current_state.astype(np.float64), p or self.params.params,
+                                  self._step_size, spacing, by_arc_length, self.rtol, self.atol,
+                                  n_points, out)
+
+    def advance_array(self, states: np.ndarray, n_steps: int = 1) -> None:
+        p = self._jit_array_params()
+        if p is not None:
+            _, iterate_array = rk4_kernels(self.equations)
+            iterate_array(states, p, self.dt, n_steps)
+            return
+        x, y, z = states[:, 0].copy(), states[:, 1].copy(), states[:, 2].copy()
+        dt = self.dt
+        half_dt = 0.5 * dt
+        f = lambda x, y, z: self.derivatives(x, y, z, xp=np)
+        for _ in range(n_steps):
+            k1x, k1y, k1z = f(x, y, z)
+            k2x, k2y, k2z = f(x + half_dt * k1x, y + half_dt * k1y, z + half_dt * k1z)
+            k3x, k3y, k3z = f(x + half_dt * k2x, y + half_dt * k2y, z + half_dt * k2z)
+            k4x, k4y, k4z = f(x + dt * k3x, y + dt * k3y, z + dt * k3z)
+            x = x + (dt / 6.0) * (k1x + 2*k2x + 2*k3x + k4x)
+            y = y + (dt / 6.0) * (k1y + 2*k2y + 2*k3y + k4y)
+            z = z + (dt / 6.0) * (k1z + 2*k2z + 2*k3z + k4z)
+        states[:, 0] = x
+        states[:, 1] = y
+        states[:, 2] = z
+
+class CliffordAttractor(MapAttractor):
+    jit_arrays = False
+
+    @staticmethod
+    def equations(x, y, p, xp=math):
+        a, b, c, d = p
+        return (xp.sin(a * y) + c * xp.cos(a * x),
+                xp.sin(b * x) + d * xp.cos(b * y))
+
+class DeJongAttractor(MapAttractor):
+    jit_arrays = False
+
+    @staticmethod
+    def equations(x, y, p, xp=math):
+        a, b, c, d = p
+        return (xp.sin(a * y) - xp.cos(b * x),
+                xp.sin(c * x) - xp.cos(d * y))
+
+class AizawaAttractor(ODEAttractor):
+    @staticmethod
+    def equations(x, y, z, p, xp=math):
+        a, b, c, d, e = p
+        return ((z - b) * x - d * y,
+                d * x + (z - b) * y,
+                c + a * z - (z * z * z) / 3 - (x * x + y * y) * (1 + e * z) + 0.1 * z * x * x * x)
+
+class ThomasAttractor(ODEAttractor):
+    jit_arrays = False
+
+    @staticmethod
+    def equations(x, y, z, p, xp=math):
+        b, = p
+        return (xp.sin(y) - b * x,
+                xp.sin(z) - b * y,
+                xp.sin(x) - b * z)
+
+class LorenzAttractor(ODEAttractor):
+    @staticmethod
+    def equations(x, y, z, p, xp=math):
+        sigma, rho, beta = p
+        return (sigma * (y - x),
+                x * (rho - z) - y,
+                x * y - beta * z)
+
+class AttractorEnsemble:
+    """
+    Many-particle mode: evolves N initial conditions of one attractor at once
+
+    The particles live in a single (N, dimension) float32 array. With the
+    numpy array path (see AttractorSystem.jit_arrays) it is split into chunks
+    and advanced on a thread pool (numpy releases the GIL); the numba kernels
+    are parallel themselves. Either way large ensembles use all cores.
+    """
+    def __init__(self, attractor: AttractorSystem, n_particles: int, spread: float = 1.0,
+                 n_workers: Optional[int] = None):
+        self.attractor = attractor
+        self.n_particles = n_particles
+        self.spread = spread
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(self.n_workers) if self.n_workers > 1 else None
+        self.reset()
+
+    def reset(self):
+        self.states = np.random.uniform(-self.spread, self.spread,
+                                        size=(self.n_particles, self.attractor.params.dimension)
+                                        ).astype(np.float32)
+
+    def close(self):
+        """Shut the thread pool down; advance() then runs on the calling thread"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def advance(self, n_steps: int = 1) -> np.ndarray:
+        if self._executor is None or self.attractor.array_backend == 'numba':
+            # numba kernels already run the particles in parallel
+            self.attractor.advance_array(self.states, n_steps)
+        else:
+            chunks = np.array_split(self.states, self.n_workers)
+            list(self._executor.map(lambda chunk: self.attractor.advance_array(chunk, n_steps), chunks))
+        return self.states
+
+def hsv_to_rgb(h, s, v) -> np.ndarray:
+    """Vectorized colorsys.hsv_to_rgb: broadcasts h, s, v and returns an (..., 3) array"""
+    h, s, v = np.broadcast_arrays(np.asarray(h, dtype=float), s, v)
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(int) % 6
+    r = np.choose(i, (v, q, p, p, t, v))
+    g = np.choose(i, (t, v, v, q, p, p))
+    b = np.choose(i, (p, p, t, v, v, q))
+    return np.stack((r, g, b), axis=-1)
+
+class TrailColormap:
+    """
+    Rainbow trail colors with a cached hue lookup table
+
+    Point i of an n point trail gets hue (i / n + shift) % 1, which is entry
+    (i + shift * n) % n of a per-length LUT, so a color shift only rotates the
+    LUT. Brightness ramps from min_value to 1 towards the newest point, and
+    colors are rebuilt only when the length or the LUT offset changes.
+    """
+    def __init__(self, saturation: float = 0.8, min_value: float = 0.2):
+        self.saturation = saturation
+        self.min_value = min_value
+        self._n_points = None
+        self._offset = None
+
+    def _build(self, n_points: int):
+        self._lut = hsv_to_rgb(np.arange(n_points) / max(n_points, 1), self.saturation, 1.0)
+        self._values = np.linspace(self.min_value, 1.0, n_points)[:, np.newaxis]
+        self._colors = np.ones((n_points, 4))
+        self._n_points = n_points
+        self._offset = None
+
+    def colors(self, n_points: int, shift: float) -> np.ndarray:
+        """(n_points, 4) RGBA colors, owned by the colormap and reused between calls"""
+        if n_points != self._n_points:
+            self._build(n_points)
+        offset = int(shift * n_points) % n_points if n_points else 0
+        if offset != self._offset:
+            # HSV -> RGB is linear in value, so scale the rotated LUT by the brightness ramp
+            rgb = self._colors[:, :3]
+            np.multiply(self._lut[offset:], self._values[:n_points - offset], out=rgb[:n_points - offset])
+            np.multiply(self._lut[:offset], self._values[n_points - offset:], out=rgb[n_points - offset:])
+            self._offset = offset
+        return self._colors
+
+# Attractors by name and the parameters each one is shown with by default
+ATTRACTOR_CLASSES = {
+    'Clifford': CliffordAttractor,
+    'DeJong': DeJongAttractor,
+    'Lorenz': LorenzAttractor,
+    'Aizawa': AizawaAttractor,
+    'Thomas': ThomasAttractor,
+}
+
+DEFAULT_PARAMS = {
+    'Lorenz': AttractorParams(
+        params=(10.0, 28.0, 8/3),
+        name='Lorenz',
+        dimension=3,
+        trail_length=10000
+    ),
+    'Clifford': AttractorParams(
+        params=(-1.4, 1.6, 1.0, 0.7),
+        name='Clifford',
+        dimension=2,
+        trail_length=10000
+    ),
+    'DeJong': AttractorParams(
+        params=(-2.0, -2.0, -1.2, 2.0),
+        name='DeJong',
+        dimension=2,
+        trail_length=10000
+    ),
+    'Aizawa': AttractorParams(
+        params=(0.95, 0.7, 0.6, 3.5, 0.25),
+        name='Aizawa',
+        dimension=3,
+        trail_length=10000
+    ),
+    'Thomas': AttractorParams(
+        params=(0.208186,),
+        name='Thomas',
+        dimension=3,
+        trail_length=10000
+    ),
+}
+
+PARAM_NAMES = {
+    'Clifford': ('a', 'b', 'c', 'd'),
+    'DeJong': ('a', 'b', 'c', 'd'),
+    'Lorenz': ('sigma', 'rho', 'beta'),
+    'Aizawa': ('a', 'b', 'c', 'd', 'e'),
+    'Thomas': ('b',),
+}
+
+def create_attractor(params: AttractorParams, backend: Optional[str] = None) -> AttractorSystem:
+    return ATTRACTOR_CLASSES.get(params.name, LorenzAttractor)(params, backend=backend)
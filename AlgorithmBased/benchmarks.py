@@ -0,0 +1,211 @@
+"""
+Headless benchmarks for the attractor simulation and frame construction
+
+Measures, without opening a window:
+- steps/s of every attractor on every available integrator backend, for
+  a single trajectory (fixed step and adaptive), and particle-steps/s
+  for an ensemble,
+- trail bookkeeping: appending to the trail and taking it as an array, and
+  the level-of-detail append and rebuild,
+- trail colours (TrailColormap) at 1k, 10k and 100k points,
+- density histogram binning and numpy trail rasterization throughput.
+
+Results are written as JSON (with the git commit and library versions), so
+runs from different commits can be compared with --compare; the exit
+status is non-zero when anything got slower than --threshold allows.
+
+Usage:
+    python benchmarks.py --output bench.json
+    python benchmarks.py --quick --output new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from attractors import (ODEAttractor, TrailBuffer, TrailColormap, ATTRACTOR_CLASSES,
+                        DEFAULT_PARAMS, AttractorEnsemble, create_attractor)
+from density_render import bin_points
+from integrators import AVAILABLE_BACKENDS
+from offline_render import TrailRasterizer
+from trail_lod import TrailLOD
+
+
+def measure(function: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> float:
+    """Best seconds per call over `repeats` timing runs of at least min_time each"""
+    function()  # warm up (numba compilation, caches)
+    best = float('inf')
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+class BenchmarkSuite:
+    def __init__(self, quick: bool = False):
+        self.quick = quick
+        self.min_time = 0.05 if quick else 0.2
+        self.repeats = 3 if quick else 5
+        self.results: List[dict] = []
+
+    def record(self, name: str, unit: str, work: float, function: Callable[[], object], **params):
+        """Time function, which does `work` units of work per call, and store the rate"""
+        seconds = measure(function, self.min_time, self.repeats)
+        result = {'name': name, 'params': params, 'unit': unit, 'value': work / seconds}
+        self.results.append(result)
+        described = ', '.join(f'{k}={v}' for k, v in params.items())
+        print(f"{name:<18} {described:<40} {result['value']:>14,.0f} {unit}")
+
+    def run(self, selected: Optional[List[str]] = None):
+        for group in ('stepping', 'trail', 'colors', 'density'):
+            if not selected or group in selected:
+                getattr(self, 'bench_' + group)()
+        return self.results
+
+    def bench_stepping(self):
+        n_steps = 2000 if self.quick else 10000
+        n_particles = 10000 if self.quick else 100000
+        for name in sorted(ATTRACTOR_CLASSES):
+            params = replace(DEFAULT_PARAMS[name], trail_length=n_steps)
+            for backend in AVAILABLE_BACKENDS:
+                attractor = create_attractor(params, backend=backend)
+                self.record('step', 'steps/s', n_steps, lambda: attractor.integrate(n_steps),
+                            attractor=name, backend=backend)
+                if isinstance(attractor, ODEAttractor):
+                    adaptive = create_attractor(params, backend=backend)
+                    adaptive.adaptive = True
+                    self.record('step_adaptive', 'points/s', n_steps, lambda: adaptive.integrate(n_steps),
+                                attractor=name, backend=backend)
+                ensemble = AttractorEnsemble(attractor, n_particles)
+                self.record('ensemble', 'particle-steps/s', n_particles, lambda: ensemble.advance(1),
+                            attractor=name, backend=backend, particles=n_particles)
+
+    def bench_trail(self):
+        chunk = np.random.normal(size=(100, 3))
+        lengths = (1000, 10000, 100000) if self.quick else (1000, 10000, 100000, 1000000)
+        for length in lengths:
+            trail = TrailBuffer(length, 3)
+            trail.extend(np.random.normal(size=(length, 3)))
+
+            def append_and_view():
+                trail.extend(chunk)
+                return np.ascontiguousarray(trail.view(), dtype=np.float32)
+
+            self.record('trail_to_array', 'frames/s', 1, append_and_view, length=length)
+
+            lod = TrailLOD(length, 3, budget=100000)
+            lod.rebuild(trail.view())
+            self.record('lod_append', 'frames/s', 1, lambda: lod.append(chunk), length=length)
+            self.record('lod_rebuild', 'points/s', length, lambda: lod.rebuild(trail.view()), length=length)
+
+    def bench_colors(self):
+        for n_points in (1000, 10000, 100000):
+            colormap = TrailColormap()
+            frame = iter(range(10 ** 9))
+            # The shift advances every frame like in the visualizer, so the colors are rebuilt
+            self.record('trail_colors', 'frames/s', 1,
+                        lambda: colormap.colors(n_points, next(frame) * 0.001 % 1.0), points=n_points)
+
+    def bench_density(self):
+        size = 1024 if self.quick else 4096
+        n_points = 1000000
+        points = np.random.uniform(-2, 2, size=(n_points, 2)).astype(np.float32)
+        histogram = np.zeros((size, size), dtype=np.uint32)
+        bounds = np.array([[-2.0, -2.0], [2.0, 2.0]])
+        self.record('density_bin', 'points/s', n_points, lambda: bin_points(histogram, bounds, points),
+                    size=size)
+
+        trail = create_attractor(replace(DEFAULT_PARAMS['Lorenz'], trail_length=10000))
+        trail_points = trail.advance(10000).copy()
+        center = trail_points.mean(axis=0)
+        radius = float(np.linalg.norm(trail_points - center, axis=1).max())
+        for style in ('lines', 'points'):
+            rasterizer = TrailRasterizer((1280, 720), center, radius, style=style)
+            self.record('rasterize', 'frames/s', 1, lambda: rasterizer.render(trail_points, 0.0, 30.0),
+                        style=style, points=len(trail_points))
+
+
+def environment() -> Dict[str, Optional[str]]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'numba': numba_version,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def result_key(result: dict) -> str:
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> List[str]:
+    """Print current/baseline rate ratios, returns the benchmarks slower than threshold"""
+    with open(baseline_path, 'r') as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+        ratio = result['value'] / previous['value']
+        described = ', '.join(f'{k}={v}' for k, v in result['params'].items())
+        flag = '  <-- slower' if ratio < threshold else ''
+        print(f"{result['name']:<18} {described:<40} {ratio:6.2f}x{flag}")
+        if ratio < threshold:
+            regressions.append(result_key(result))
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark attractor stepping and frame construction")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and shorter timings")
+    parser.add_argument('--only', nargs='+', choices=('stepping', 'trail', 'colors', 'density'),
+                        help="run only these benchmark groups")
+    parser.add_argument('--output', help="JSON file for the results")
+    parser.add_argument('--compare', metavar='BASELINE', help="results JSON of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="with --compare, fail if a rate drops below this fraction of the baseline")
+    args = parser.parse_args(argv)
+
+    np.random.seed(0)
+    results = BenchmarkSuite(quick=args.quick).run(args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'quick': args.quick, 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than {args.threshold:.0%} of the baseline")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+High-resolution density images of the 2D attractor maps
+
+Instead of drawing a trail, many walkers are iterated together (see
+AttractorEnsemble) and every visited point is binned into a 2D histogram.
+Only the walkers and the histogram are kept in memory, so a render can go
+to 1e9 iterations and beyond, and the state can be checkpointed to disk and
+resumed later. The histogram is tone-mapped (log or gamma) into an image.
+
+Usage:
+    python density_render.py --attractor Clifford --iterations 1e9 --size 8192 8192 \
+        --checkpoint clifford.npz --output clifford_density.png
+    python density_render.py --trajectory clifford.npy --size 4096 4096 --output clifford_density.png
+"""
+import argparse
+import os
+import time
+from dataclasses import replace
+from typing import Optional, Tuple
+import numpy as np
+from attractors import (AttractorEnsemble, MapAttractor, DEFAULT_PARAMS,
+                        create_attractor, hsv_to_rgb)
+from offline_render import write_png
+from trajectory_store import open_trajectory, sample_points
+
+
+class DensityAccumulator:
+    """
+    Accumulates the visit density of a 2D map attractor on a pixel grid
+
+    Each call to run() iterates the walker ensemble and bins the new points;
+    calls can be repeated, and save()/load() make the accumulation resumable.
+    """
+    def __init__(self, attractor: MapAttractor, size: Tuple[int, int], n_walkers: int = 1000000,
+                 burn_in: int = 32, bounds: Optional[np.ndarray] = None,
+                 n_workers: Optional[int] = None):
+        if not isinstance(attractor, MapAttractor):
+            raise ValueError(f"Density rendering needs a 2D map attractor, got {attractor.params.name}")
+        self.attractor = attractor
+        self.width, self.height = size
+        self.histogram = np.zeros((self.height, self.width), dtype=np.uint32)
+        self.iterations = 0
+        self.ensemble = AttractorEnsemble(attractor, n_walkers, spread=1.0, n_workers=n_workers)
+        # Let the walkers settle onto the attractor before anything is binned
+        self.ensemble.advance(burn_in)
+        self.bounds = self._fit_bounds() if bounds is None else np.asarray(bounds, dtype=float)
+
+    def _fit_bounds(self, margin: float = 0.02) -> np.ndarray:
+        """[[xmin, ymin], [xmax, ymax]] covering the walkers, padded and with square pixels"""
+        low, high = np.percentile(self.ensemble.states, (0.01, 99.99), axis=0)
+        center = (low + high) / 2
+        pixel = (1 + 2 * margin) * max((high - low) / (self.width, self.height))
+        pixel = max(pixel, 1e-9)  # walkers collapsed onto a fixed point
+        half = pixel * np.array([self.width, self.height]) / 2
+        return np.array([center - half, center + half])
+
+    def run(self, n_iterations: int, checkpoint_path: Optional[str] = None,
+            checkpoint_every: float = 300.0, verbose: bool = False):
+        """
+        Add about n_iterations points (rounded up to whole walker rounds)
+
+        With a checkpoint_path, the state is saved every checkpoint_every
+        seconds and at the end.
+        """
+        n_walkers = len(self.ensemble.states)
+        rounds = -(-int(n_iterations) // n_walkers)
+        last_save = time.time()
+        for i in range(rounds):
+            self._accumulate(self.ensemble.advance(1))
+            self.iterations += n_walkers
+            if checkpoint_path and time.time() - last_save > checkpoint_every:
+                self.save(checkpoint_path)
+                last_save = time.time()
+            if verbose and (i + 1) % 100 == 0:
+                print(f"{self.iterations:.3g} iterations")
+        if checkpoint_path:
+            self.save(checkpoint_path)
+
+    def _accumulate(self, points: np.ndarray):
+        bin_points(self.histogram, self.bounds, points)
+
+    def save(self, path: str):
+        """Write the accumulation state to an .npz file (atomically)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, histogram=self.histogram, walkers=self.ensemble.states,
+                     bounds=self.bounds, iterations=self.iterations,
+                     name=self.attractor.params.name, params=np.array(self.attractor.params.params))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, n_workers: Optional[int] = None) -> 'DensityAccumulator':
+        """Resume an accumulation saved with save()"""
+        with np.load(path) as state:
+            params = replace(DEFAULT_PARAMS[str(state['name'])], params=tuple(float(p) for p in state['params']))
+            histogram = state['histogram']
+            walkers = state['walkers']
+            accumulator = cls(create_attractor(params), (histogram.shape[1], histogram.shape[0]),
+                              n_walkers=len(walkers), burn_in=0, bounds=state['bounds'],
+                              n_workers=n_workers)
+            accumulator.histogram = histogram
+            accumulator.ensemble.states = walkers
+            accumulator.iterations = int(state['iterations'])
+        return accumulator
+
+    def image(self, mode: str = 'log', gamma: float = 2.2, hue: float = 0.08) -> np.ndarray:
+        return tone_map(self.histogram, mode=mode, gamma=gamma, hue=hue)
+
+
+def bin_points(histogram: np.ndarray, bounds: np.ndarray, points: np.ndarray):
+    """Add the (x, y) of each point to an (H, W) histogram spanning bounds [[xmin, ymin], [xmax, ymax]]"""
+    height, width = histogram.shape
+    low, high = bounds
+    xs = ((points[:, 0] - low[0]) * (width / (high[0] - low[0]))).astype(np.int64)
+    ys = ((points[:, 1] - low[1]) * (height / (high[1] - low[1]))).astype(np.int64)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    indices = ys[inside] * width + xs[inside]
+    flat = histogram.reshape(-1)
+    if flat.size <= 4 * len(indices):
+        flat += np.bincount(indices, minlength=flat.size).astype(np.uint32)
+    else:
+        # A full-size bincount would allocate more than the chunk itself
+        bins, counts = np.unique(indices, return_counts=True)
+        flat[bins] += counts.astype(np.uint32)
+
+
+def trajectory_histogram(path: str, size: Tuple[int, int], margin: float = 0.02,
+                         chunk_size: int = 1 << 22) -> np.ndarray:
+    """
+    Density histogram of a stored 2D trajectory (see trajectory_store)
+
+    The trajectory is memory-mapped and binned chunk by chunk, so it can be
+    far larger than memory.
+    """
+    points, metadata = open_trajectory(path)
+    if metadata['dimension'] != 2:
+        raise ValueError(f"Density rendering needs a 2D map trajectory, got {metadata['name']}")
+    width, height = size
+    low, high = np.percentile(sample_points(points), (0.01, 99.99), axis=0)
+    center = (low + high) / 2
+    pixel = max((1 + 2 * margin) * max((high - low) / (width, height)), 1e-9)
+    half = pixel * np.array([width, height]) / 2
+    bounds = np.array([center - half, center + half])
+    histogram = np.zeros((height, width), dtype=np.uint32)
+    for start in range(0, len(points), chunk_size):
+        bin_points(histogram, bounds, points[start:start + chunk_size])
+    return histogram
+
+
+def tone_map(histogram: np.ndarray, mode: str = 'log', gamma: float = 2.2,
+             hue: float = 0.08, band_rows: int = 512) -> np.ndarray:
+    """
+    Turn a density histogram into an (H, W, 3) uint8 image, y axis pointing up
+
+    mode='log' compresses the density with log1p before the gamma curve,
+    mode='gamma' applies the gamma curve to the linear density. Dense areas
+    fade from a saturated `hue` to white.
+    """
+    if mode not in ('log', 'gamma'):
+        raise ValueError(f"Unknown tone mapping mode: {mode}")
+    compress = np.log1p if mode == 'log' else (lambda density: density)
+    peak = float(compress(np.float64(histogram.max()))) or 1.0
+
+    # Work in bands of rows so print-size histograms don't need full-size float copies
+    height, width = histogram.shape
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    for top in range(0, height, band_rows):
+        band = histogram[top:top + band_rows]
+        value = (compress(band.astype(np.float32)) / peak) ** (1.0 / gamma)
+        rgb = hsv_to_rgb(hue, 1.0 - 0.8 * value, value)
+        # Flip so that y points up in the image
+        image[height - top - len(band):height - top] = (rgb[::-1] * 255).astype(np.uint8)
+    return image
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Render a density image of a 2D attractor map")
+    parser.add_argument('--attractor', choices=('Clifford', 'DeJong'), default='Clifford')
+    parser.add_argument('--params', type=float, nargs=4)
+    parser.add_argument('--iterations', type=float, default=1e8)
+    parser.add_argument('--size', type=int, nargs=2, default=(4096, 4096), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--walkers', type=int, default=1000000, help="points iterated together per chunk")
+    parser.add_argument('--mode', choices=('log', 'gamma'), default='log')
+    parser.add_argument('--gamma', type=float, default=2.2)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--checkpoint', help="state file to resume from and save to")
+    parser.add_argument('--trajectory', help="bin the points of a stored trajectory instead of iterating walkers")
+    parser.add_argument('--output', required=True, help="PNG image path")
+    args = parser.parse_args(argv)
+
+    if args.trajectory:
+        histogram = trajectory_histogram(args.trajectory, tuple(args.size))
+        write_png(args.output, tone_map(histogram, mode=args.mode, gamma=args.gamma))
+        print(f"{int(histogram.sum()):.3g} points of {args.trajectory} rendered to {args.output}")
+        return
+
+    if args.seed is not None:
+        np.random.seed(args.seed)
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        accumulator = DensityAccumulator.load(args.checkpoint)
+        print(f"Resuming {accumulator.attractor.params} at {accumulator.iterations:.3g} iterations")
+    else:
+        params = DEFAULT_PARAMS[args.attractor]
+        params = replace(params, params=tuple(args.params or params.params))
+        print(f"params: {params}")
+        accumulator = DensityAccumulator(create_attractor(params), tuple(args.size), n_walkers=args.walkers)
+
+    accumulator.run(max(args.iterations - accumulator.iterations, 0),
+                    checkpoint_path=args.checkpoint, verbose=True)
+    write_png(args.output, accumulator.image(mode=args.mode, gamma=args.gamma))
+    print(f"{accumulator.iterations:.3g} iterations rendered to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Per-stage frame timing for the attractor visualizer
+
+Each frame, the visualizer times its stages (stepping the attractor,
+uploading the trail, drawing, ...) with FrameProfiler.stage() and closes
+the frame with end_frame(), passing counters such as the number of steps
+and of drawn points. Rolling percentiles over the last `window` frames
+feed the on-canvas HUD, and the full per-frame trace can be dumped to JSON
+or CSV to compare runs.
+"""
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+import numpy as np
+
+
+class FrameProfiler:
+    def __init__(self, window: int = 300, max_trace_frames: int = 100000):
+        self.window = window
+        self.stage_names = []
+        self._durations = {}  # stage name -> rolling durations in seconds
+        self._counters = {}  # counter name -> rolling values
+        self._frame_ends = deque(maxlen=window + 1)
+        self._current = {}
+        self.frame = 0
+        self.trace = deque(maxlen=max_trace_frames)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as part of the current frame (repeated stages add up)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        if name not in self._durations:
+            self.stage_names.append(name)
+            self._durations[name] = deque(maxlen=self.window)
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def end_frame(self, **counters: float):
+        """Close the current frame; stages timed since the previous end_frame belong to it"""
+        now = time.perf_counter()
+        self._frame_ends.append(now)
+        row = {'frame': self.frame, 'time': now}
+        for name in self.stage_names:
+            seconds = self._current.get(name, 0.0)
+            self._durations[name].append(seconds)
+            row[name + '_ms'] = seconds * 1e3
+        for name, value in counters.items():
+            self._counters.setdefault(name, deque(maxlen=self.window)).append(value)
+            row[name] = value
+        self.trace.append(row)
+        self._current = {}
+        self.frame += 1
+
+    def fps(self) -> float:
+        if len(self._frame_ends) < 2:
+            return 0.0
+        return (len(self._frame_ends) - 1) / (self._frame_ends[-1] - self._frame_ends[0])
+
+    def rate(self, counter: str) -> float:
+        """Per-second rate of a counter over the rolling window (e.g. steps/s)"""
+        values = self._counters.get(counter)
+        if not values or len(self._frame_ends) < 2:
+            return 0.0
+        n = min(len(values), len(self._frame_ends) - 1)
+        return sum(list(values)[-n:]) / (self._frame_ends[-1] - self._frame_ends[-1 - n])
+
+    def latest(self, counter: str, default: float = 0.0) -> float:
+        values = self._counters.get(counter)
+        return values[-1] if values else default
+
+    def percentiles(self, name: str, q: Iterable[float] = (50, 95, 99)) -> Dict[str, float]:
+        """Rolling percentiles of a stage in milliseconds, e.g. {'p50': ..., 'p95': ..., 'p99': ...}"""
+        durations = np.array(self._durations.get(name, ())) * 1e3
+        if not len(durations):
+            return {f'p{p:g}': 0.0 for p in q}
+        return {f'p{p:g}': float(v) for p, v in zip(q, np.percentile(durations, q))}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: dict(self.percentiles(name), mean=float(np.mean(self._durations[name]) * 1e3))
+                for name in self.stage_names}
+
+    def hud_text(self, extra: Optional[Dict[str, str]] = None) -> str:
+        lines = [f"{self.fps():5.1f} FPS"]
+        lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        for name in self.stage_names:
+            p = self.percentiles(name)
+            lines.append(f"{name:>8}: {p['p50']:6.2f} / {p['p95']:6.2f} / {p['p99']:6.2f} ms")
+        return '\n'.join(lines)
+
+    def dump(self, path: str):
+        """Write the per-frame trace as CSV (.csv) or as JSON with the summary (anything else)"""
+        rows = list(self.trace)
+        if path.lower().endswith('.csv'):
+            fields = ['frame', 'time'] + [name + '_ms' for name in self.stage_names] + list(self._counters)
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=fields, restval='')
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, 'w') as f:
+                json.dump({'window': self.window, 'summary': self.summary(), 'frames': rows}, f, indent=1)
@@ -0,0 +1,234 @@
+"""
+Integrator backends for the attractor systems
+
+- 'numpy': single trajectories run as a plain-float Python loop, many
+  trajectories (ensembles, screening) as vectorized numpy operations.
+- 'numba': the attractor equations and the map iteration / RK4 loops are
+  compiled with numba; arrays of trajectories run in parallel on all cores.
+
+Continuous attractors can also use an adaptive Dormand-Prince integrator
+(dopri5_kernel), compiled with numba or run as Python depending on the
+backend.
+
+numba is optional: without it only the numpy backend is available.
+DEFAULT_BACKEND is the fastest backend found at import time.
+"""
+from functools import lru_cache
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+AVAILABLE_BACKENDS = ('numba', 'numpy') if numba is not None else ('numpy',)
+DEFAULT_BACKEND = AVAILABLE_BACKENDS[0]
+
+
+def check_backend(backend: str) -> str:
+    if backend not in AVAILABLE_BACKENDS:
+        raise ValueError(f"Integrator backend {backend!r} is not available "
+                         f"(available: {', '.join(AVAILABLE_BACKENDS)})")
+    return backend
+
+
+@lru_cache(maxsize=None)
+def map_kernels(equations):
+    """
+    Compile (iterate, iterate_array) for a 2D map's equations(x, y, p)
+
+    iterate(x, y, p, n_steps, out) writes the n_steps visited points into out
+    (releasing the GIL, so it can run in a simulation thread next to the GUI),
+    iterate_array(states, p, n_steps) advances every row of states in place.
+    """
+    f = numba.njit(equations)
+
+    @numba.njit(nogil=True)
+    def iterate(x, y, p, n_steps, out):
+        for i in range(n_steps):
+            x, y = f(x, y, p)
+            out[i, 0] = x
+            out[i, 1] = y
+
+    @numba.njit(parallel=True)
+    def iterate_array(states, p, n_steps):
+        for j in numba.prange(states.shape[0]):
+            x, y = states[j, 0], states[j, 1]
+            for _ in range(n_steps):
+                x, y = f(x, y, p)
+            states[j, 0] = x
+            states[j, 1] = y
+
+    return iterate, iterate_array
+
+
+@lru_cache(maxsize=None)
+def rk4_kernels(equations):
+    """
+    Compile (iterate, iterate_array) for a 3D flow's equations(x, y, z, p)
+
+    Same interface as map_kernels, with the time step dt passed after p.
+    """
+    f = numba.njit(equations)
+
+    @numba.njit
+    def rk4_step(x, y, z, p, dt):
+        half_dt = 0.5 * dt
+        k1x, k1y, k1z = f(x, y, z, p)
+        k2x, k2y, k2z = f(x + half_dt * k1x, y + half_dt * k1y, z + half_dt * k1z, p)
+        k3x, k3y, k3z = f(x + half_dt * k2x, y + half_dt * k2y, z + half_dt * k2z, p)
+        k4x, k4y, k4z = f(x + dt * k3x, y + dt * k3y, z + dt * k3z, p)
+        return (x + (dt / 6.0) * (k1x + 2*k2x + 2*k3x + k4x),
+                y + (dt / 6.0) * (k1y + 2*k2y + 2*k3y + k4y),
+                z + (dt / 6.0) * (k1z + 2*k2z + 2*k3z + k4z))
+
+    @numba.njit(nogil=True)
+    def iterate(x, y, z, p, dt, n_steps, out):
+        for i in range(n_steps):
+            x, y, z = rk4_step(x, y, z, p, dt)
+            out[i, 0] = x
+            out[i, 1] = y
+            out[i, 2] = z
+
+    @numba.njit(parallel=True)
+    def iterate_array(states, p, dt, n_steps):
+        for j in numba.prange(states.shape[0]):
+            x, y, z = states[j, 0], states[j, 1], states[j, 2]
+            for _ in range(n_steps):
+                x, y, z = rk4_step(x, y, z, p, dt)
+            states[j, 0] = x
+            states[j, 1] = y
+            states[j, 2] = z
+
+    return iterate, iterate_array
+
+
+# Dormand-Prince 5(4) tableau with its 4th order dense output (as in Hairer's DOPRI5)
+DOPRI5_A = np.array([
+    [0.0, 0.0, 0.0, 0.0, 0.0],
+    [1/5, 0.0, 0.0, 0.0, 0.0],
+    [3/40, 9/40, 0.0, 0.0, 0.0],
+    [44/45, -56/15, 32/9, 0.0, 0.0],
+    [19372/6561, -25360/2187, 64448/6561, -212/729, 0.0],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+])
+DOPRI5_B = np.array([35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84])
+DOPRI5_E = np.array([-71/57600, 0.0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+DOPRI5_P = np.array([
+    [1.0, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0.0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0.0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0.0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0.0, 40617522/29380423, -110615467/29380423, 69997945/29380423],
+])
+
+
+@lru_cache(maxsize=None)
+def dopri5_kernel(equations, jit: bool):
+    """
+    Build an adaptive Dormand-Prince integrator for a 3D flow's equations(x, y, z, p)
+
+    iterate(state, p, h, spacing, by_arc_length, rtol, atol, n_points, out)
+    integrates from state with error-controlled steps (first trial step h) and
+    writes n_points into out, spaced `spacing` apart in time or, with
+    by_arc_length, in distance along the curve. Points between steps come
+    from the dense output, so long steps on smooth stretches still give an
+    evenly sampled trail. Returns the step size to continue with.
+
+    With jit the kernel is compiled by numba, otherwise it runs as Python.
+    """
+    f = numba.njit(equations) if jit else equations
+    A, B, E, P = DOPRI5_A, DOPRI5_B, DOPRI5_E, DOPRI5_P
+    # Arc length within a step is measured along this many chords of the dense output
+    arc_segments = 8
+
+    def dense(y, K, h, theta, out):
+        for j in range(3):
+            acc = 0.0
+            for m in range(7):
+                acc += K[m, j] * (P[m, 0] + theta * (P[m, 1] + theta * (P[m, 2] + theta * P[m, 3])))
+            out[j] = y[j] + h * theta * acc
+
+    if jit:
+        dense = numba.njit(dense)
+
+    def iterate(state, p, h, spacing, by_arc_length, rtol, atol, n_points, out):
+        y = state.copy()
+        y_new = np.empty(3)
+        stage = np.empty(3)
+        previous = np.empty(3)
+        current = np.empty(3)
+        K = np.empty((7, 3))
+        K[0, 0], K[0, 1], K[0, 2] = f(y[0], y[1], y[2], p)
+        travelled = 0.0  # time or arc length since the starting point
+        target = spacing
+        n_segments = arc_segments if by_arc_length else 1
+        i = 0
+        max_steps = 1000 * n_points + 1000
+        for _ in range(max_steps):
+            if i >= n_points:
+                break
+            for s in range(1, 6):
+                for j in range(3):
+                    acc = y[j]
+                    for m in range(s):
+                        acc += h * A[s, m] * K[m, j]
+                    stage[j] = acc
+                K[s, 0], K[s, 1], K[s, 2] = f(stage[0], stage[1], stage[2], p)
+            for j in range(3):
+                acc = y[j]
+                for m in range(6):
+                    acc += h * B[m] * K[m, j]
+                y_new[j] = acc
+            K[6, 0], K[6, 1], K[6, 2] = f(y_new[0], y_new[1], y_new[2], p)
+
+            # Scaled RMS of the embedded 4th order error estimate
+            err = 0.0
+            for j in range(3):
+                e = 0.0
+                for m in range(7):
+                    e += h * E[m] * K[m, j]
+                scale = atol + rtol * max(abs(y[j]), abs(y_new[j]))
+                err += (e / scale) ** 2
+            err = (err / 3) ** 0.5
+
+            if err <= 1.0:
+                for j in range(3):
+                    previous[j] = y[j]
+                for q in range(n_segments):
+                    if by_arc_length:
+                        dense(y, K, h, (q + 1) / n_segments, current)
+                        length = ((current[0] - previous[0]) ** 2 + (current[1] - previous[1]) ** 2
+                                  + (current[2] - previous[2]) ** 2) ** 0.5
+                    else:
+                        length = h
+                    while i < n_points and target <= travelled + length:
+                        theta = (q + (target - travelled) / length) / n_segments
+                        dense(y, K, h, theta, out[i])
+                        i += 1
+                        target += spacing
+                    travelled += length
+                    for j in range(3):
+                        previous[j] = current[j]
+                for j in range(3):
+                    y[j] = y_new[j]
+                    K[0, j] = K[6, j]
+
+            # Standard step size control, also shrinking on nan/inf errors
+            if err == 0.0:
+                factor = 5.0
+            elif err != err or err > 1e30:
+                factor = 0.2
+            else:
+                factor = min(5.0, max(0.2, 0.9 * err ** -0.2))
+            h = max(h * factor, 1e-12)
+
+        # Stuck (e.g. at a fixed point with arc length spacing): repeat the last point
+        for k in range(i, n_points):
+            for j in range(3):
+                out[k, j] = out[k - 1, j] if k > 0 else y[j]
+        return h
+
+    return numba.njit(iterate, nogil=True) if jit else iterate
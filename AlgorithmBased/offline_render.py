@@ -0,0 +1,374 @@
+"""
+Headless offline renderer for attractor videos and stills
+
+Runs an attractor without Qt or OpenGL and rasterizes its trail with numpy,
+so artwork can be batch-produced on machines without a display. Frames are
+handed to a writer thread through a small bounded queue, which keeps memory
+flat however long the run is.
+
+Usage:
+    python offline_render.py --attractor Lorenz --steps 60000 --output frames/frame_%05d.png
+    python offline_render.py --attractor Clifford --params -1.4 1.6 1.0 0.7 --output clifford.mp4
+    python offline_render.py --attractor DeJong --steps 200000 --output dejong.png
+    python offline_render.py --attractor Lorenz --steps 1000000 --record lorenz.npy --output lorenz.png
+    python offline_render.py --replay lorenz.npy --steps-per-frame 500 --output frames/frame_%05d.png
+"""
+import argparse
+import os
+import queue
+import struct
+import subprocess
+import threading
+import zlib
+from dataclasses import replace
+from typing import Optional, Tuple
+import numpy as np
+from attractors import (AttractorSystem, ODEAttractor, TrailColormap, DEFAULT_PARAMS, PARAM_NAMES,
+                        create_attractor)
+from integrators import AVAILABLE_BACKENDS, DEFAULT_BACKEND
+from trajectory_store import (TrajectoryRecorder, load_attractor, open_trajectory,
+                              sample_points, trajectory_windows)
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi', '.webm')
+
+
+def write_png(path: str, image: np.ndarray, compression: int = 6):
+    """Write an (H, W, 3) uint8 RGB image as a PNG using only the standard library"""
+    height, width, _ = image.shape
+    # Every scanline starts with filter type 0 (none)
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), compression)))
+        f.write(chunk(b'IEND', b''))
+
+
+def read_png(path: str) -> np.ndarray:
+    """Read back an (H, W, 3) uint8 image written by write_png (8-bit RGB, no row filters)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"{path} is not a PNG file")
+    position = 8
+    header = None
+    compressed = []
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position + 4])
+        tag = data[position + 4:position + 8]
+        body = data[position + 8:position + 8 + length]
+        if tag == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif tag == b'IDAT':
+            compressed.append(body)
+        position += length + 12
+    width, height, bit_depth, color_type = header[:4]
+    if (bit_depth, color_type) != (8, 2):
+        raise ValueError(f"{path}: only 8-bit RGB PNGs are supported")
+    raw = np.frombuffer(zlib.decompress(b''.join(compressed)), dtype=np.uint8)
+    raw = raw.reshape(height, width * 3 + 1)
+    if raw[:, 0].any():
+        raise ValueError(f"{path}: filtered scanlines are not supported")
+    return raw[:, 1:].reshape(height, width, 3).copy()
+
+
+class PNGSequenceWriter:
+    """
+    Writes frames to a printf-style path pattern, e.g. frames/frame_%05d.png
+
+    A path without a placeholder is a still: every frame overwrites it.
+    """
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.index = 0
+        directory = os.path.dirname(pattern)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame: np.ndarray):
+        path = self.pattern % self.index if '%' in self.pattern else self.pattern
+        write_png(path, frame)
+        self.index += 1
+
+    def close(self):
+        pass
+
+
+class FFmpegWriter:
+    """Streams raw RGB frames into an ffmpeg process that encodes the video file"""
+    def __init__(self, path: str, size: Tuple[int, int], fps: int = 60):
+        width, height = size
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error',
+             '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps),
+             '-i', '-', '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray):
+        self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
+
+
+class TrailRasterizer:
+    """
+    Pure-numpy orthographic rasterizer for attractor trails
+
+    2D attractors are drawn in the plane; 3D ones are turned around their
+    vertical axis by `azimuth` degrees and seen from `elevation` degrees,
+    like the turntable camera of the live visualizer.
+    """
+    def __init__(self, size: Tuple[int, int], center: np.ndarray, radius: float,
+                 style: str = 'lines', elevation: float = 30.0):
+        self.width, self.height = size
+        self.center = np.asarray(center, dtype=float)
+        self.scale = 0.45 * min(self.width, self.height) / max(radius, 1e-9)
+        self.style = style
+        self.elevation = elevation
+        self.colormap = TrailColormap()
+
+    def project(self, points: np.ndarray, azimuth: float = 0.0) -> np.ndarray:
+        """Map (N, dim) points to (N, 2) pixel coordinates (x right, y down)"""
+        centered = points - self.center
+        if points.shape[1] == 2:
+            u, v = centered[:, 0], centered[:, 1]
+        else:
+            az, el = np.radians(azimuth), np.radians(self.elevation)
+            x = centered[:, 0] * np.cos(az) - centered[:, 1] * np.sin(az)
+            y = centered[:, 0] * np.sin(az) + centered[:, 1] * np.cos(az)
+            u = x
+            v = centered[:, 2] * np.cos(el) + y * np.sin(el)
+        return np.column_stack((self.width / 2 + u * self.scale,
+                                self.height / 2 - v * self.scale))
+
+    def render(self, points: np.ndarray, shift: float = 0.0, azimuth: float = 0.0) -> np.ndarray:
+        """Rasterize a trail (oldest point first) into a new (H, W, 3) uint8 frame"""
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        if len(points) == 0:
+            return frame
+        pixels = self.project(points, azimuth)
+        colors = (self.colormap.colors(len(points), shift)[:, :3] * 255).astype(np.uint8)
+
+        if self.style == 'lines' and len(points) > 1:
+            pixels, segment = self._sample_segments(pixels)
+            colors = colors[segment]
+        self._splat(frame, pixels, colors)
+
+        # Current point marker
+        x, y = np.rint(self.project(points[-1:], azimuth)[0]).astype(int)
+        frame[max(y - 2, 0):max(y + 3, 0), max(x - 2, 0):max(x + 3, 0)] = 255
+        return frame
+
+    def _sample_segments(self, pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sample every segment of the polyline about once per pixel (vectorized DDA)"""
+        start, end = pixels[:-1], pixels[1:]
+        delta = end - start
+        max_length = self.width + self.height
+        lengths = np.clip(np.ceil(np.abs(delta).max(axis=1)), 1, max_length).astype(int)
+        segment = np.repeat(np.arange(len(start)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        t = (np.arange(len(segment)) - offsets[segment]) / lengths[segment]
+        return start[segment] + delta[segment] * t[:, np.newaxis], segment
+
+    def _splat(self, frame: np.ndarray, pixels: np.ndarray, colors: np.ndarray):
+        xs, ys = np.rint(pixels).astype(int).T
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        # Later (newer) points are written last and end up on top
+        frame[ys[inside], xs[inside]] = colors[inside]
+
+
+def estimate_extent(attractor: AttractorSystem, n_steps: int = 20000) -> Tuple[np.ndarray, float]:
+    """Run a throwaway copy of the attractor to find a center and radius that frame it"""
+    probe = create_attractor(replace(attractor.params, trail_length=1))
+    probe.dt = attractor.dt
+    probe.current_state[:] = attractor.current_state
+    points = probe.advance(n_steps)[n_steps // 10:]  # skip the initial transient
+    low, high = np.percentile(points, (0.1, 99.9), axis=0)
+    center = (low + high) / 2
+    if points.shape[1] == 2:
+        radius = (high - low).max() / 2
+    else:
+        # 3D trails rotate, so fit the bounding sphere rather than the box
+        radius = np.percentile(np.linalg.norm(points - center, axis=1), 99.9)
+    return center, 1.05 * radius
+
+
+def render(attractor: AttractorSystem, writer, n_steps: int, steps_per_frame: int,
+           size: Tuple[int, int], style: str = 'lines', rotation: float = 0.1,
+           color_speed: float = 0.001, still: bool = False, queue_size: int = 4,
+           recorder: Optional[TrajectoryRecorder] = None):
+    """
+    Simulate n_steps of the attractor and stream the frames to writer
+
+    Rasterizing happens on the calling thread while a writer thread encodes
+    and saves frames; at most queue_size frames are in flight. With
+    still=True only the final frame is written. With a recorder, every
+    simulated point is also appended to its trajectory store.
+    """
+    center, radius = estimate_extent(attractor)
+    rasterizer = TrailRasterizer(size, center, radius, style=style)
+    n_frames = max(n_steps // steps_per_frame, 1)
+
+    def trails():
+        for _ in range(n_frames):
+            points = attractor.advance(steps_per_frame)
+            if recorder is not None:
+                recorder.append(points)
+            yield attractor.trail.view()
+
+    stream_frames(trails(), n_frames, rasterizer, writer, rotation, color_speed, still, queue_size)
+
+
+def replay(path: str, writer, steps_per_frame: int, size: Tuple[int, int],
+           trail_length: Optional[int] = None, style: str = 'lines', rotation: float = 0.1,
+           color_speed: float = 0.001, still: bool = False, queue_size: int = 4):
+    """
+    Render a stored trajectory (see trajectory_store) without integrating it
+
+    The trajectory is memory-mapped, so only the trail of each frame is read
+    from disk. A frame is drawn every steps_per_frame stored points.
+    """
+    points, metadata = open_trajectory(path)
+    trail_length = trail_length or metadata['trail_length']
+    sample = sample_points(points)
+    low, high = np.percentile(sample, (0.1, 99.9), axis=0)
+    center = (low + high) / 2
+    if points.shape[1] == 2:
+        radius = (high - low).max() / 2
+    else:
+        radius = np.percentile(np.linalg.norm(sample - center, axis=1), 99.9)
+    rasterizer = TrailRasterizer(size, center, 1.05 * radius, style=style)
+    n_frames = len(points) // steps_per_frame
+    windows = trajectory_windows(metadata, len(points), trail_length, steps_per_frame)
+    trails = (np.asarray(points[start:stop], dtype=float) for start, stop in windows)
+    stream_frames(trails, n_frames, rasterizer, writer, rotation, color_speed, still, queue_size)
+
+
+def stream_frames(trails, n_frames: int, rasterizer: TrailRasterizer, writer, rotation: float,
+                  color_speed: float, still: bool, queue_size: int):
+    """Rasterize n_frames trails on this thread and write them from a writer thread"""
+    frames = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def write_frames():
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            if not errors:
+                try:
+                    writer.write(frame)
+                except Exception as e:
+                    errors.append(e)  # keep draining so the producer never blocks
+
+    writer_thread = threading.Thread(target=write_frames, daemon=True)
+    writer_thread.start()
+
+    azimuth = 0.0
+    shift = 0.0
+    try:
+        for i, trail in enumerate(trails):
+            azimuth += rotation
+            shift = (shift + color_speed) % 1.0
+            if still and i < n_frames - 1:
+                continue
+            frames.put(rasterizer.render(trail, shift, azimuth))
+            if errors:
+                break
+    finally:
+        frames.put(None)
+        writer_thread.join()
+        writer.close()
+    if errors:
+        raise errors[0]
+
+
+def create_writer(output: str, size: Tuple[int, int], fps: int):
+    if output.lower().endswith(VIDEO_EXTENSIONS):
+        return FFmpegWriter(output, size, fps)
+    return PNGSequenceWriter(output)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Render attractor videos and stills without a display")
+    parser.add_argument('--attractor', choices=sorted(DEFAULT_PARAMS), default='Lorenz')
+    parser.add_argument('--params', type=float, nargs='+',
+                        help="attractor parameters (defaults to the ones used by the live visualizer)")
+    parser.add_argument('--steps', type=int, default=20000, help="total number of simulation steps")
+    parser.add_argument('--steps-per-frame', type=int, default=100)
+    parser.add_argument('--trail-length', type=int, default=10000)
+    parser.add_argument('--size', type=int, nargs=2, default=(1920, 1080), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--style', choices=('lines', 'points'), default='lines')
+    parser.add_argument('--fps', type=int, default=60)
+    parser.add_argument('--rotation', type=float, default=0.1, help="azimuth change per frame in degrees (3D)")
+    parser.add_argument('--seed', type=int, help="seed for the random initial state")
+    parser.add_argument('--backend', choices=AVAILABLE_BACKENDS, default=DEFAULT_BACKEND,
+                        help="integrator backend")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="error-controlled Dormand-Prince steps for continuous attractors")
+    parser.add_argument('--tolerance', type=float, default=1e-6, help="relative tolerance for --adaptive")
+    parser.add_argument('--arc-length', type=float,
+                        help="with --adaptive, emit trail points this far apart along the curve instead of every time step")
+    parser.add_argument('--record', metavar='TRAJECTORY',
+                        help="also store every simulated point in this .npy trajectory (resumed if it exists)")
+    parser.add_argument('--replay', metavar='TRAJECTORY',
+                        help="render a stored trajectory instead of simulating")
+    parser.add_argument('--output', required=True,
+                        help="video file (.mp4, ...), PNG sequence pattern (frame_%%05d.png) or still image (.png)")
+    args = parser.parse_args(argv)
+
+    size = tuple(args.size)
+    still = not args.output.lower().endswith(VIDEO_EXTENSIONS) and '%' not in args.output
+    if args.replay:
+        writer = create_writer(args.output, size, args.fps)
+        replay(args.replay, writer, args.steps_per_frame, size, trail_length=args.trail_length,
+               style=args.style, rotation=args.rotation, still=still)
+        print(f"Rendered {args.replay} to {args.output}")
+        return
+
+    if args.seed is not None:
+        np.random.seed(args.seed)
+    if args.record and os.path.exists(args.record):
+        attractor = load_attractor(args.record, backend=args.backend, trail_length=args.trail_length)
+        params = attractor.params
+        print(f"Resuming {args.record}")
+    else:
+        names = PARAM_NAMES[args.attractor]
+        if args.params is not None and len(args.params) != len(names):
+            parser.error(f"{args.attractor} takes {len(names)} parameters ({', '.join(names)}), "
+                         f"got {len(args.params)}")
+        params = DEFAULT_PARAMS[args.attractor]
+        params = replace(params, params=tuple(args.params or params.params), trail_length=args.trail_length)
+        attractor = create_attractor(params, backend=args.backend)
+    print(f"params: {params}")
+    print(f"integrator backend: {attractor.backend}")
+    if args.adaptive:
+        if not isinstance(attractor, ODEAttractor):
+            parser.error(f"--adaptive only applies to continuous attractors, not {params.name}")
+        attractor.adaptive = True
+        attractor.rtol = args.tolerance
+        attractor.arc_length = args.arc_length
+
+    recorder = TrajectoryRecorder(args.record, attractor, seed=args.seed) if args.record else None
+    writer = create_writer(args.output, size, args.fps)
+    try:
+        render(attractor, writer, args.steps, args.steps_per_frame, size,
+               style=args.style, rotation=args.rotation, still=still, recorder=recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
+            print(f"{recorder.count} points stored in {args.record}")
+    print(f"Rendered to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
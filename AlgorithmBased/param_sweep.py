@@ -0,0 +1,192 @@
+"""
+Multi-process parameter-space sweep for attractor galleries
+
+Expands ranges of attractor parameters into a grid, renders a thumbnail and
+summary statistics for every combination on a process pool, and collects
+the results into contact-sheet images and an index.json file. Combinations
+already in the index (with their thumbnail on disk) are skipped, so an
+interrupted or extended sweep only renders what is missing.
+
+Usage:
+    python param_sweep.py --attractor Clifford --grid a=-2:2:21 b=-2:2:21 --output sweeps/clifford
+    python param_sweep.py --attractor Lorenz --grid rho=10:40:31 --output sweeps/lorenz
+    python param_sweep.py --attractor DeJong --grid a=-3:3:41 d=-3:3:41 --screen --output sweeps/dejong
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from attractors import MapAttractor, DEFAULT_PARAMS, PARAM_NAMES, create_attractor
+from density_render import DensityAccumulator
+from offline_render import TrailRasterizer, read_png, write_png
+from screening import passes_screening, screen
+
+
+def parse_grid(attractor_name: str, specs: List[str]) -> List[Tuple[float, ...]]:
+    """
+    Expand name=start:stop:count (or name=value) specs into parameter tuples
+
+    Parameters without a spec keep their default value.
+    """
+    names = PARAM_NAMES[attractor_name]
+    axes = {name: [value] for name, value in zip(names, DEFAULT_PARAMS[attractor_name].params)}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in axes:
+            raise ValueError(f"{attractor_name} has no parameter {name!r} (expected one of {names})")
+        parts = [float(v) for v in values.split(':')]
+        if len(parts) == 1:
+            axes[name] = parts
+        elif len(parts) == 3:
+            axes[name] = list(np.linspace(parts[0], parts[1], int(parts[2])))
+        else:
+            raise ValueError(f"Invalid grid spec {spec!r}, expected name=start:stop:count or name=value")
+    return [tuple(float(v) for v in combo) for combo in itertools.product(*(axes[name] for name in names))]
+
+
+def combination_key(attractor_name: str, params: Tuple[float, ...]) -> str:
+    return attractor_name + ''.join(f"_{name}{value:+.4f}"
+                                    for name, value in zip(PARAM_NAMES[attractor_name], params))
+
+
+def render_thumbnail(attractor_name: str, params: Tuple[float, ...], size: int,
+                     iterations: int) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Render one combination: a density image for maps, a trail image for flows"""
+    attractor = create_attractor(replace(DEFAULT_PARAMS[attractor_name], params=params,
+                                         trail_length=iterations))
+    if isinstance(attractor, MapAttractor):
+        n_walkers = min(iterations, 20000)
+        accumulator = DensityAccumulator(attractor, (size, size), n_walkers=n_walkers, n_workers=1)
+        accumulator.run(iterations)
+        low, high = accumulator.bounds
+        image = accumulator.image()
+        fill_ratio = float((accumulator.histogram > 0).mean())
+        return image, {'fill_ratio': fill_ratio, 'extent': float((high - low).max()), 'diverged': False}
+
+    with np.errstate(all='ignore'):
+        points = attractor.advance(iterations)
+        if not np.isfinite(points).all():
+            return (np.zeros((size, size, 3), dtype=np.uint8),
+                    {'fill_ratio': 0.0, 'extent': float('inf'), 'diverged': True})
+    settled = points[len(points) // 10:]
+    low, high = settled.min(axis=0), settled.max(axis=0)
+    center = (low + high) / 2
+    radius = float(np.linalg.norm(settled - center, axis=1).max())
+    image = TrailRasterizer((size, size), center, radius).render(points, azimuth=30.0)
+    fill_ratio = float(image.any(axis=2).mean())
+    return image, {'fill_ratio': fill_ratio, 'extent': float((high - low).max()), 'diverged': False}
+
+
+def sweep_worker(task: Tuple[str, Tuple[float, ...], str, int, int]) -> Tuple[Tuple[float, ...], Dict[str, float]]:
+    """Process pool entry point: render, save the thumbnail and return its stats"""
+    attractor_name, params, thumbnail_path, size, iterations = task
+    # Seed from the combination so reruns produce the same thumbnail
+    np.random.seed(zlib.crc32(thumbnail_path.encode()))
+    image, stats = render_thumbnail(attractor_name, params, size, iterations)
+    write_png(thumbnail_path, image)
+    return params, stats
+
+
+def load_index(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_index(index: Dict[str, dict], path: str):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def write_contact_sheets(index: Dict[str, dict], output_dir: str, thumbnail_size: int,
+                         per_sheet: int = 400, columns: Optional[int] = None) -> List[str]:
+    """Tile the thumbnails (in key order) into contact_XXXX.png sheets of at most per_sheet each"""
+    keys = sorted(index)
+    paths = []
+    for sheet_number, first in enumerate(range(0, len(keys), per_sheet)):
+        sheet_keys = keys[first:first + per_sheet]
+        n_columns = columns or math.ceil(math.sqrt(len(sheet_keys)))
+        n_rows = math.ceil(len(sheet_keys) / n_columns)
+        sheet = np.zeros((n_rows * thumbnail_size, n_columns * thumbnail_size, 3), dtype=np.uint8)
+        for i, key in enumerate(sheet_keys):
+            row, column = divmod(i, n_columns)
+            thumbnail = read_png(os.path.join(output_dir, index[key]['thumbnail']))[:thumbnail_size, :thumbnail_size]
+            sheet[row * thumbnail_size:row * thumbnail_size + thumbnail.shape[0],
+                  column * thumbnail_size:column * thumbnail_size + thumbnail.shape[1]] = thumbnail
+        path = os.path.join(output_dir, f'contact_{sheet_number:04d}.png')
+        write_png(path, sheet)
+        paths.append(path)
+    return paths
+
+
+def run_sweep(attractor_name: str, combinations: List[Tuple[float, ...]], output_dir: str,
+              thumbnail_size: int = 128, iterations: int = 200000,
+              n_workers: Optional[int] = None, save_every: int = 50) -> Dict[str, dict]:
+    """Render every combination not already in output_dir/index.json and return the updated index"""
+    thumbnail_dir = os.path.join(output_dir, 'thumbnails')
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, 'index.json')
+    index = load_index(index_path)
+
+    tasks = []
+    for params in combinations:
+        key = combination_key(attractor_name, params)
+        thumbnail = os.path.join('thumbnails', key + '.png')
+        if key in index and os.path.exists(os.path.join(output_dir, thumbnail)):
+            continue
+        tasks.append((attractor_name, params, os.path.join(output_dir, thumbnail), thumbnail_size, iterations))
+    print(f"{len(combinations) - len(tasks)} of {len(combinations)} combinations already rendered")
+
+    with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+        futures = [executor.submit(sweep_worker, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            params, stats = future.result()
+            key = combination_key(attractor_name, params)
+            index[key] = {
+                'attractor': attractor_name,
+                'params': dict(zip(PARAM_NAMES[attractor_name], params)),
+                'thumbnail': os.path.join('thumbnails', key + '.png'),
+                'stats': stats,
+            }
+            if done % save_every == 0:
+                save_index(index, index_path)
+                print(f"{done}/{len(tasks)} rendered")
+    save_index(index, index_path)
+    return index
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Render thumbnails over a grid of attractor parameters")
+    parser.add_argument('--attractor', choices=sorted(DEFAULT_PARAMS), default='Clifford')
+    parser.add_argument('--grid', nargs='*', default=[],
+                        help="parameter ranges as name=start:stop:count or name=value")
+    parser.add_argument('--thumbnail-size', type=int, default=128)
+    parser.add_argument('--iterations', type=int, default=200000, help="points per thumbnail")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--screen', action='store_true',
+                        help="only render combinations that look chaotic and spread out (Lyapunov/fill screening)")
+    parser.add_argument('--output', required=True, help="directory for thumbnails, index and contact sheets")
+    args = parser.parse_args(argv)
+
+    combinations = parse_grid(args.attractor, args.grid)
+    if args.screen:
+        passing = passes_screening(screen(args.attractor, np.array(combinations)))
+        print(f"{passing.sum()} of {len(combinations)} combinations pass screening")
+        combinations = [combo for combo, ok in zip(combinations, passing) if ok]
+    index = run_sweep(args.attractor, combinations, args.output, thumbnail_size=args.thumbnail_size,
+                      iterations=args.iterations, n_workers=args.workers)
+    sheets = write_contact_sheets(index, args.output, args.thumbnail_size)
+    print(f"{len(index)} combinations indexed, {len(sheets)} contact sheet(s) in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Background simulation thread for the attractor visualizer
+
+The SimulationWorker steps the attractor (and the optional dust ensemble)
+on its own thread at a steady rate of steps_per_tick points per tick,
+independent of how fast the GUI draws. New points go into a pending
+buffer; take() swaps it with a spare one under a short lock and hands
+the GUI every point produced since the previous take (double buffering),
+so the GUI timer never waits for the simulation.
+
+The worker owns the attractor state, the GUI owns the trail: controls are
+sent to the worker as commands (pause, reset, speed, trail length, ...)
+and applied between ticks. Each reset bumps a generation number, so
+points produced before the reset are recognizable and dropped.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from attractors import AttractorEnsemble, AttractorSystem, TrailBuffer
+from trajectory_store import TrajectoryRecorder
+
+# Points kept for the GUI at most; if it stalls longer, older points are dropped
+MAX_PENDING_POINTS = 1 << 18
+
+
+@dataclass
+class Snapshot:
+    points: np.ndarray  # new points, oldest first; valid until the next take()
+    generation: int
+    overflowed: bool  # points were dropped between this and the previous snapshot
+    dust: Optional[np.ndarray] = None  # latest ensemble states, if the dust is on
+
+
+class SimulationWorker:
+    def __init__(self, attractor: AttractorSystem, steps_per_tick: int = 1, tick_rate: float = 60.0,
+                 recorder: Optional[TrajectoryRecorder] = None):
+        self.attractor = attractor
+        self.recorder = recorder
+        self.steps_per_tick = steps_per_tick
+        self.tick_interval = 1.0 / tick_rate
+        self.paused = False
+        self.ensemble = None
+        self.generation = 0  # latest generation requested by the GUI
+        self._published_generation = 0  # generation of the points in _pending
+        self._commands = queue.Queue()
+        self._lock = threading.Lock()
+        capacity = min(attractor.trail.capacity, MAX_PENDING_POINTS)
+        self._pending = TrailBuffer(capacity, attractor.params.dimension)
+        self._spare = TrailBuffer(capacity, attractor.params.dimension)
+        self._produced = 0  # points added to _pending since the last take
+        self._dust = None
+        self._thread = threading.Thread(target=self._run, name='attractor-simulation', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread and close the recorder (which checkpoints it)"""
+        self._commands.put(('stop',))
+        self._thread.join()
+        if self.recorder is not None:
+            self.recorder.close()
+        # Shut down the thread pools of the dust ensemble and of any that never reached the worker
+        ensembles = [self.ensemble]
+        while not self._commands.empty():
+            command = self._commands.get_nowait()
+            if command[0] == 'dust':
+                ensembles.append(command[1])
+        for ensemble in ensembles:
+            if ensemble is not None:
+                ensemble.close()
+
+    # Commands, applied by the worker between ticks
+
+    def set_paused(self, paused: bool):
+        self._commands.put(('pause', paused))
+
+    def set_speed(self, steps_per_tick: int):
+        self._commands.put(('speed', steps_per_tick))
+
+    def set_trail_length(self, length: int):
+        self._commands.put(('trail_length', length))
+
+    def set_adaptive(self, adaptive: bool):
+        self._commands.put(('adaptive', adaptive))
+
+    def set_dust(self, n_particles: Optional[int]):
+        """Start a dust ensemble of n_particles, or stop it with None"""
+        ensemble = None
+        if n_particles:
+            ensemble = AttractorEnsemble(self.attractor, n_particles)
+            # First parallel numba call on this (main) thread: with the TBB threading
+            # layer, starting it from the worker thread hangs the interpreter at exit
+            ensemble.advance(1)
+        self._commands.put(('dust', ensemble))
+
+    def reset(self, state: np.ndarray) -> int:
+        """Restart from state, returns the generation that the new points will carry"""
+        self.generation += 1
+        self._commands.put(('reset', self.generation, np.array(state, dtype=float)))
+        return self.generation
+
+    def take(self) -> Snapshot:
+        """All points produced since the last take (GUI thread)"""
+        with self._lock:
+            self._pending, self._spare = self._spare, self._pending
+            self._pending.clear()
+            produced, self._produced = self._produced, 0
+            generation = self._published_generation
+            dust = self._dust
+        points = self._spare.view()
+        return Snapshot(points, generation, produced > len(points), dust)
+
+    # Worker thread
+
+    def _apply(self, command: tuple) -> bool:
+        name = command[0]
+        if name == 'stop':
+            return False
+        if name == 'pause':
+            self.paused = command[1]
+        elif name == 'speed':
+            self.steps_per_tick = command[1]
+        elif name == 'adaptive':
+            self.attractor.adaptive = command[1]
+        elif name == 'trail_length':
+            capacity = min(command[1], MAX_PENDING_POINTS)
+            with self._lock:
+                self._pending.resize(capacity)
+                self._spare = TrailBuffer(capacity, self._spare.dimension)
+        elif name == 'dust':
+            if self.ensemble is not None:
+                self.ensemble.close()  # each ensemble has its own thread pool
+            self.ensemble = command[1]
+            with self._lock:
+                self._dust = None
+        elif name == 'reset':
+            _, generation, state = command
+            self.attractor.current_state[:] = state
+            if self.ensemble is not None:
+                self.ensemble.reset()
+            if self.recorder is not None:
+                self.recorder.new_segment(state)
+            with self._lock:
+                self._pending.clear()
+                self._produced = 0
+                self._published_generation = generation
+        return True
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while True:
+            try:
+                # Block while paused, otherwise just drain what has arrived
+                command = self._commands.get(timeout=0.1) if self.paused else self._commands.get_nowait()
+                if not self._apply(command):
+                    return
+                continue
+            except queue.Empty:
+                if self.paused:
+                    next_tick = time.perf_counter()
+                    continue
+
+            points = self.attractor.integrate(self.steps_per_tick)
+            if self.recorder is not None:
+                self.recorder.append(points)
+            dust = self.ensemble.advance().copy() if self.ensemble is not None else None
+            with self._lock:
+                self._pending.extend(points)
+                self._produced += len(points)
+                if dust is not None:
+                    self._dust = dust
+
+            next_tick += self.tick_interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -5 * self.tick_interval:
+                next_tick = time.perf_counter()  # fell behind, don't try to catch up in a burst
@@ -0,0 +1,137 @@
+"""
+Level of detail for very long trails
+
+A trail of millions of points is drawn as two parts:
+- the most recent detail_length points at full resolution,
+- the older history decimated into buckets of `bucket` points, each
+  reduced to two vertices: the point deviating most from the chord across
+  the bucket (so sharp turns survive) and the bucket's last point.
+
+The split is chosen so both parts together stay within a vertex budget.
+Points are bucketed incrementally as they age out of the detail window,
+so appending costs the same however long the trail is; only a change of
+budget or trail length needs a rebuild from the full trail.
+"""
+import math
+import numpy as np
+from attractors import TrailBuffer
+
+
+def decimate(points: np.ndarray, bucket: int, anchors: np.ndarray) -> np.ndarray:
+    """
+    Reduce consecutive buckets of points to (most deviating point, last point) pairs
+
+    points holds a whole number of buckets, anchors[i] is the point just
+    before bucket i (the start of its chord).
+    """
+    if bucket == 1:
+        return np.array(points)
+    dimension = points.shape[1]
+    groups = points.reshape(-1, bucket, dimension)
+    ends = groups[:, -1]
+    chords = ends - anchors
+    relative = groups - anchors[:, np.newaxis]
+    lengths = np.maximum(np.einsum('nd,nd->n', chords, chords), 1e-30)
+    t = np.einsum('nkd,nd->nk', relative, chords) / lengths[:, np.newaxis]
+    offsets = relative - t[..., np.newaxis] * chords[:, np.newaxis]
+    extreme = np.einsum('nkd,nkd->nk', offsets, offsets)[:, :-1].argmax(axis=1)
+    vertices = np.empty((len(groups), 2, dimension))
+    vertices[:, 0] = groups[np.arange(len(groups)), extreme]
+    vertices[:, 1] = ends
+    return vertices.reshape(-1, dimension)
+
+
+class TrailLOD:
+    """
+    Incremental bookkeeping of the detail window and the decimated history
+
+    append() and rebuild() return the history vertices to add, the visual
+    keeps the vertices themselves. recent holds the detail window plus the
+    points not yet bucketed.
+    """
+    def __init__(self, trail_length: int, dimension: int, budget: int):
+        self.dimension = dimension
+        self.configure(trail_length, budget)
+
+    def configure(self, trail_length: int, budget: int):
+        """Choose the detail window and bucket size for a trail length and vertex budget, dropping all points"""
+        self.trail_length = trail_length
+        self.budget = budget
+        self.detail_length = min(trail_length, max(budget // 2, 2))
+        history_length = trail_length - self.detail_length
+        history_budget = max(budget - self.detail_length, 2)
+        self.bucket = max(1, math.ceil(2 * history_length / history_budget))
+        self.vertices_per_bucket = 1 if self.bucket == 1 else 2
+        self.history_capacity = math.ceil(history_length / self.bucket) * self.vertices_per_bucket
+        self.recent = TrailBuffer(self.detail_length + 2 * self.bucket + 1, self.dimension)
+        self.clear()
+
+    def clear(self):
+        self.recent.clear()
+        self.unbucketed = 0  # recent points after the last complete bucket
+        self.history_size = 0
+
+    @property
+    def stride(self) -> float:
+        """Average number of trail points per history vertex"""
+        return self.bucket / self.vertices_per_bucket
+
+    @property
+    def detail_size(self) -> int:
+        """Recent points to draw, including the end of the last bucket so both parts connect"""
+        return min(self.unbucketed + (1 if self.history_size else 0), len(self.recent))
+
+    @property
+    def total(self) -> float:
+        """Length of the trail represented by both parts, in points"""
+        return self.unbucketed + self.history_size * self.stride
+
+    def append(self, points: np.ndarray) -> np.ndarray:
+        """Add new points (oldest first), returns the history vertices that aged out of the detail window"""
+        points = np.asarray(points)
+        n_buckets = 0
+        if self.history_capacity:
+            n_buckets = max(self.unbucketed + len(points) - self.detail_length, 0) // self.bucket
+        vertices = np.empty((0, self.dimension))
+        if n_buckets:
+            # The anchor (end of the last bucket) and the points to bucket, old then new
+            view = self.recent.view()
+            old = view[max(len(view) - self.unbucketed - 1, 0):]
+            if len(old) == self.unbucketed:
+                # Very first bucket: anchor on its first point
+                old = np.concatenate([old[:1] if len(old) else points[:1], old])
+            n_bucketed = n_buckets * self.bucket
+            sequence = old[:n_bucketed + 1]
+            if len(sequence) < n_bucketed + 1:
+                sequence = np.concatenate([sequence, points[:n_bucketed + 1 - len(sequence)]])
+            vertices = decimate(sequence[1:], self.bucket, sequence[:n_bucketed:self.bucket])
+            self.unbucketed -= n_bucketed
+            self.history_size = min(self.history_size + len(vertices), self.history_capacity)
+        self.recent.extend(points)
+        self.unbucketed += len(points)
+        if not self.history_capacity:
+            self.unbucketed = min(self.unbucketed, self.detail_length)
+        return vertices
+
+    def rebuild(self, points: np.ndarray) -> np.ndarray:
+        """Start over from a whole trail (oldest first), returns all history vertices (vectorized)"""
+        self.clear()
+        points = np.asarray(points)[-self.trail_length:]
+        n_buckets = 0
+        if self.history_capacity:
+            n_buckets = max(len(points) - self.detail_length, 0) // self.bucket
+        end = n_buckets * self.bucket
+        if n_buckets:
+            start = max(end - (self.history_capacity // self.vertices_per_bucket) * self.bucket, 0)
+            bucketed = points[start:end]
+            anchors = bucketed[self.bucket - 1::self.bucket][:-1]
+            anchors = np.concatenate([points[max(start - 1, 0)][np.newaxis], anchors])
+            vertices = decimate(bucketed, self.bucket, anchors)
+        else:
+            vertices = np.empty((0, self.dimension))
+        self.recent.extend(points[max(end - 1, 0):])
+        self.unbucketed = len(points) - end
+        if not self.history_capacity:
+            self.unbucketed = min(self.unbucketed, self.detail_length)
+        self.history_size = len(vertices)
+        return vertices
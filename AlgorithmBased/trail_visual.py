@@ -0,0 +1,218 @@
+from typing import Optional
+import numpy as np
+from vispy import gloo, scene, visuals
+from trail_lod import TrailLOD
+
+# Trail colors are computed on the GPU from each vertex's age: hue cycles along
+# the trail and is offset by u_shift, brightness ramps up towards the newest point.
+# Ages are mapped to positions along a longer trail (u_newer, u_stride, u_total),
+# so a decimated history and the detailed recent part color as one trail.
+VERTEX_SHADER = """
+attribute vec3 a_position;
+attribute float a_slot;
+
+uniform float u_head;   // slot the next point will be written to
+uniform float u_size;   // number of points currently in the trail
+uniform float u_slots;  // number of slots in the circular buffer (capacity + 1)
+uniform float u_shift;  // hue offset in [0, 1)
+uniform float u_newer;  // trail points newer than this buffer's newest vertex
+uniform float u_stride; // trail points per vertex
+uniform float u_total;  // length of the whole trail in points
+
+varying vec4 v_color;
+varying float v_valid;
+
+vec3 hsv_to_rgb(vec3 c) {
+    vec4 K = vec4(1.0, 2.0 / 3.0, 1.0 / 3.0, 3.0);
+    vec3 p = abs(fract(c.xxx + K.xyz) * 6.0 - K.www);
+    return c.z * mix(K.xxx, clamp(p - K.xxx, 0.0, 1.0), c.y);
+}
+
+void main() {
+    float age = floor(mod(u_head - 1.0 - a_slot + u_slots, u_slots) + 0.5);
+    v_valid = age < u_size ? 1.0 : 0.0;
+
+    float i = u_total - 1.0 - (u_newer + age * u_stride);  // index from the oldest point
+    float hue = fract(i / u_total + u_shift);
+    float value = u_total > 1.0 ? mix(0.2, 1.0, clamp(i / (u_total - 1.0), 0.0, 1.0)) : 1.0;
+    v_color = vec4(hsv_to_rgb(vec3(hue, 0.8, value)), 1.0);
+
+    gl_Position = $transform(vec4(a_position, 1.0));
+}
+"""
+
+FRAGMENT_SHADER = """
+varying vec4 v_color;
+varying float v_valid;
+
+void main() {
+    // Segments touching an empty or expired slot (including the wrap-around
+    // from the newest to the oldest slot) are not part of the trail
+    if (v_valid < 0.999)
+        discard;
+    gl_FragColor = v_color;
+}
+"""
+
+
+class TrailVisual(visuals.Visual):
+    """
+    Rainbow trail line kept in a circular vertex buffer on the GPU
+
+    Only newly appended points are uploaded (as sub-buffer writes), so the
+    per-frame upload cost is proportional to the steps per frame rather than
+    the trail length. The buffer has capacity + 1 slots and is drawn as one
+    line strip in slot order; the extra slot is always empty, which breaks
+    the strip between the newest and the oldest point. Slot 0 is mirrored in
+    a last vertex (as TrailBuffer mirrors its data), so the strip also joins
+    the last slot to slot 0 once the trail wraps around.
+    """
+    def __init__(self, capacity: int, dimension: int = 3):
+        visuals.Visual.__init__(self, vcode=VERTEX_SHADER, fcode=FRAGMENT_SHADER)
+        self._draw_mode = 'line_strip'
+        self.set_gl_state('translucent', depth_test=False)
+        self.dimension = dimension
+        self.shift = 0.0
+        self.draw_limit = None
+        self.age_mapping = None
+        self.resize(capacity)
+
+    def resize(self, capacity: int):
+        """Reallocate the vertex buffer for a new trail length, dropping its contents"""
+        self.capacity = capacity
+        self._slots = capacity + 1
+        self._positions = gloo.VertexBuffer(np.zeros((self._slots + 1, 3), dtype=np.float32))
+        self.shared_program['a_position'] = self._positions
+        slots = np.append(np.arange(self._slots), 0).astype(np.float32)
+        self.shared_program['a_slot'] = gloo.VertexBuffer(slots)
+        self.shared_program['u_slots'] = float(self._slots)
+        self.clear()
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self._update_uniforms()
+
+    def append(self, points: np.ndarray):
+        """Upload new trail points (oldest first) into the circular buffer"""
+        points = np.asarray(points)[-self.capacity:]
+        n = len(points)
+        if n == 0:
+            return
+        data = np.zeros((n, 3), dtype=np.float32)
+        data[:, :self.dimension] = points
+        # At most two writes: up to the end of the buffer, then from slot 0
+        first = min(n, self._slots - self._head)
+        self._positions.set_subdata(data[:first], offset=self._head)
+        if first < n:
+            self._positions.set_subdata(data[first:], offset=0)
+        # Keep the mirror of slot 0 after the last slot in sync
+        if self._head == 0:
+            self._positions.set_subdata(data[:1], offset=self._slots)
+        elif first < n:
+            self._positions.set_subdata(data[first:first + 1], offset=self._slots)
+        self._head = (self._head + n) % self._slots
+        self._size = min(self._size + n, self.capacity)
+        self._update_uniforms()
+
+    def set_shift(self, shift: float):
+        self.shift = shift
+        self.shared_program['u_shift'] = float(shift)
+        self.update()
+
+    def set_draw_limit(self, limit: Optional[int]):
+        """Only draw the newest limit points (None: all of them)"""
+        self.draw_limit = limit
+        self._update_uniforms()
+
+    def set_age_mapping(self, total: float, newer: float = 0.0, stride: float = 1.0):
+        """Color this buffer as the part of a total-point trail starting newer points back, stride points per vertex"""
+        self.age_mapping = (total, newer, stride)
+        self._update_uniforms()
+
+    @property
+    def drawn_size(self) -> int:
+        return self._size if self.draw_limit is None else min(self._size, self.draw_limit)
+
+    def _update_uniforms(self):
+        total, newer, stride = self.age_mapping or (self.drawn_size, 0.0, 1.0)
+        self.shared_program['u_head'] = float(self._head)
+        self.shared_program['u_size'] = float(self.drawn_size)
+        self.shared_program['u_shift'] = float(self.shift)
+        self.shared_program['u_total'] = float(total)
+        self.shared_program['u_newer'] = float(newer)
+        self.shared_program['u_stride'] = float(stride)
+        self.update()
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view):
+        if self.drawn_size < 2:
+            return False
+
+
+class LODTrailVisual(visuals.CompoundVisual):
+    """
+    Trail of up to millions of points drawn within a vertex budget
+
+    Recent points are drawn at full detail, older ones from a decimated
+    history (see trail_lod); both are TrailVisual ring buffers, so only
+    new points and new history vertices are uploaded each frame. Changing
+    the budget or the trail length rebuilds both from the full trail.
+    """
+    def __init__(self, trail_length: int, dimension: int = 3, budget: int = 100000):
+        self.lod = TrailLOD(trail_length, dimension, budget)
+        self.detail = TrailVisual(self.lod.recent.capacity, dimension)
+        self.history = TrailVisual(max(self.lod.history_capacity, 1), dimension)
+        visuals.CompoundVisual.__init__(self, [self.history, self.detail])
+
+    @property
+    def trail_length(self) -> int:
+        return self.lod.trail_length
+
+    @property
+    def budget(self) -> int:
+        return self.lod.budget
+
+    def reset(self, points: np.ndarray, trail_length: Optional[int] = None,
+              budget: Optional[int] = None):
+        """Rebuild from the whole trail, optionally with a new trail length or vertex budget"""
+        self.lod.configure(trail_length or self.lod.trail_length, budget or self.lod.budget)
+        self.detail.resize(self.lod.recent.capacity)
+        self.history.resize(max(self.lod.history_capacity, 1))
+        self.history.append(self.lod.rebuild(points))
+        self.detail.append(self.lod.recent.view())
+        self._update_mapping()
+
+    def clear(self):
+        self.lod.clear()
+        self.detail.clear()
+        self.history.clear()
+        self._update_mapping()
+
+    def append(self, points: np.ndarray):
+        """Add new trail points (oldest first)"""
+        self.detail.append(points)
+        vertices = self.lod.append(np.asarray(points))
+        if len(vertices):
+            self.history.append(vertices)
+        self._update_mapping()
+
+    def set_shift(self, shift: float):
+        self.detail.set_shift(shift)
+        self.history.set_shift(shift)
+
+    @property
+    def drawn_vertices(self) -> int:
+        return self.detail.drawn_size + self.history.drawn_size
+
+    def _update_mapping(self):
+        total = self.lod.total
+        self.detail.set_draw_limit(self.lod.detail_size)
+        self.detail.set_age_mapping(total)
+        self.history.set_age_mapping(total, newer=self.lod.unbucketed, stride=self.lod.stride)
+
+
+Trail = scene.visuals.create_visual_node(TrailVisual)
+LODTrail = scene.visuals.create_visual_node(LODTrailVisual)
@@ -0,0 +1,220 @@
+"""
+On-disk trajectory store for long attractor runs
+
+A trajectory is two files:
+- <path>: a standard .npy array of float32 points, shape (count, dimension).
+  It is written in chunks and its header is rewritten in place after each
+  chunk, so np.load(path, mmap_mode='r') (see open_trajectory) maps even a
+  10^9 point trajectory without reading it into memory.
+- <path>.json: the attractor name, parameters, dt, seed and a checkpoint
+  (point count, the exact float64 state after the last stored point and,
+  for flows, the integrator settings in use there: adaptive mode, spacing,
+  tolerances and the adaptive step size), from which integration can be
+  resumed as if it had never stopped.
+
+The header is only updated after the chunk it describes is on disk, so an
+interrupted run leaves a consistent trajectory up to the last checkpoint.
+"""
+import json
+import os
+import struct
+from dataclasses import replace
+from typing import Iterator, Optional, Tuple
+import numpy as np
+from attractors import AttractorSystem, ODEAttractor, DEFAULT_PARAMS, create_attractor
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Fixed header size (a multiple of 64, as numpy expects), so the shape can be
+# rewritten in place as points are appended
+NPY_HEADER_SIZE = 128
+POINT_DTYPE = np.dtype('<f4')
+
+
+def _npy_header(count: int, dimension: int) -> bytes:
+    header = repr({'descr': POINT_DTYPE.str, 'fortran_order': False, 'shape': (count, dimension)})
+    header_length = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+    padding = header_length - len(header) - 1
+    return NPY_MAGIC + struct.pack('<H', header_length) + header.encode('latin1') + b' ' * padding + b'\n'
+
+
+def metadata_path(path: str) -> str:
+    return path + '.json'
+
+
+def read_metadata(path: str) -> dict:
+    with open(metadata_path(path), 'r') as f:
+        return json.load(f)
+
+
+def open_trajectory(path: str) -> Tuple[np.memmap, dict]:
+    """Memory-map a stored trajectory read-only, returns (points, metadata)"""
+    metadata = read_metadata(path)
+    points = np.load(path, mmap_mode='r')
+    # Points past the last checkpoint (an interrupted chunk) are not trusted
+    return points[:metadata['count']], metadata
+
+
+def segment_start(metadata: dict, index: int) -> int:
+    """First point of the continuous segment that contains point index (segments split at resets)"""
+    starts = [start for start in metadata['segments'] if start <= index]
+    return starts[-1] if starts else 0
+
+
+def integrator_settings(attractor: AttractorSystem) -> dict:
+    """Integrator settings to checkpoint with a flow's state, {} for maps"""
+    if not isinstance(attractor, ODEAttractor):
+        return {}
+    return {
+        'adaptive': attractor.adaptive,
+        'arc_length': attractor.arc_length,
+        'rtol': attractor.rtol,
+        'atol': attractor.atol,
+        'step_size': float(attractor._step_size),
+    }
+
+
+def load_attractor(path: str, backend: Optional[str] = None,
+                   trail_length: Optional[int] = None) -> AttractorSystem:
+    """Recreate the attractor of a stored trajectory, positioned at its last checkpoint"""
+    metadata = read_metadata(path)
+    params = replace(DEFAULT_PARAMS[metadata['name']], params=tuple(metadata['params']),
+                     trail_length=trail_length or metadata['trail_length'])
+    attractor = create_attractor(params, backend=backend)
+    attractor.dt = metadata['dt']
+    if isinstance(attractor, ODEAttractor):
+        attractor.adaptive = metadata.get('adaptive', False)
+        attractor.arc_length = metadata.get('arc_length')
+        attractor.rtol = metadata.get('rtol', attractor.rtol)
+        attractor.atol = metadata.get('atol', attractor.atol)
+        attractor._step_size = metadata.get('step_size', attractor.dt)
+    attractor.current_state[:] = metadata['state']
+    return attractor
+
+
+class TrajectoryRecorder:
+    """
+    Appends the points of a running attractor to a trajectory store
+
+    If path already holds a trajectory of the same attractor, recording
+    resumes it: anything after the last checkpoint is dropped, the attractor
+    is moved to the checkpoint state and its trail refilled from disk.
+    Points are buffered and written every chunk_size points (and on flush()
+    and close()).
+    """
+    def __init__(self, path: str, attractor: AttractorSystem, seed: Optional[int] = None,
+                 chunk_size: int = 1 << 16):
+        self.path = path
+        self.attractor = attractor
+        self.dimension = attractor.params.dimension
+        self._buffer = np.empty((chunk_size, self.dimension), dtype=POINT_DTYPE)
+        self._buffered = 0
+        self._state = attractor.current_state.astype(float)
+        self._settings = integrator_settings(attractor)
+
+        if os.path.exists(path) and os.path.exists(metadata_path(path)):
+            self.metadata = read_metadata(path)
+            if (self.metadata['name'] != attractor.params.name
+                    or tuple(self.metadata['params']) != tuple(float(p) for p in attractor.params.params)):
+                raise ValueError(f"{path} holds a trajectory of {self.metadata['name']} "
+                                 f"{self.metadata['params']}, not of {attractor.params}")
+            self._file = open(path, 'r+b')
+            self._file.truncate(NPY_HEADER_SIZE + self.count * self.dimension * POINT_DTYPE.itemsize)
+            self._resume()
+        else:
+            self.metadata = {
+                'name': attractor.params.name,
+                'params': [float(p) for p in attractor.params.params],
+                'dimension': self.dimension,
+                'trail_length': attractor.params.trail_length,
+                'dt': attractor.dt,
+                'seed': seed,
+                'count': 0,
+                'segments': [0],
+                'state': self._state.tolist(),
+                **self._settings,
+            }
+            self._file = open(path, 'w+b')
+            self._file.write(_npy_header(0, self.dimension))
+            self._write_metadata()
+
+    @property
+    def count(self) -> int:
+        """Number of points recorded, including the ones not yet flushed"""
+        return self.metadata['count'] + self._buffered
+
+    def _resume(self):
+        self._state = np.array(self.metadata['state'], dtype=float)
+        self.attractor.current_state[:] = self._state
+        points, _ = open_trajectory(self.path)
+        start = max(segment_start(self.metadata, len(points)), len(points) - self.attractor.trail.capacity)
+        self.attractor.trail.clear()
+        self.attractor.trail.extend(points[start:].astype(float))
+        del points
+
+    def append(self, points: np.ndarray):
+        """Record an (n, dimension) array of consecutive points"""
+        if len(points) == 0:
+            return
+        self._state = np.array(points[-1], dtype=float)
+        # The settings may change between calls (e.g. the adaptive steps toggle)
+        self._settings = integrator_settings(self.attractor)
+        while len(points):
+            n = min(len(points), len(self._buffer) - self._buffered)
+            self._buffer[self._buffered:self._buffered + n] = points[:n]
+            self._buffered += n
+            points = points[n:]
+            if self._buffered == len(self._buffer):
+                self.flush()
+
+    def new_segment(self, state: np.ndarray):
+        """Start a new continuous segment at state, e.g. after the system was reset"""
+        if self.count not in self.metadata['segments']:
+            self.metadata['segments'].append(self.count)
+        self._state = np.array(state, dtype=float)
+        self._settings = integrator_settings(self.attractor)
+
+    def flush(self):
+        """Write the buffered points and checkpoint the state after them"""
+        if self._buffered:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self.metadata['count'] += self._buffered
+            self._buffered = 0
+            self._file.seek(0)
+            self._file.write(_npy_header(self.metadata['count'], self.dimension))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.metadata['state'] = self._state.tolist()
+        self.metadata.update(self._settings)
+        self._write_metadata()
+
+    def _write_metadata(self):
+        tmp_path = metadata_path(self.path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        os.replace(tmp_path, metadata_path(self.path))
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> 'TrajectoryRecorder':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def sample_points(points: np.ndarray, max_points: int = 200000) -> np.ndarray:
+    """An evenly strided subset of a (possibly memory-mapped) trajectory, for bounds estimates"""
+    step = max(len(points) // max_points, 1)
+    return np.asarray(points[::step], dtype=float)
+
+
+def trajectory_windows(metadata: dict, count: int, trail_length: int,
+                       steps_per_frame: int) -> Iterator[Tuple[int, int]]:
+    """(start, stop) trail windows ending every steps_per_frame points, not crossing resets"""
+    for stop in range(steps_per_frame, count + 1, steps_per_frame):
+        yield max(stop - trail_length, segment_start(metadata, stop - 1)), stop
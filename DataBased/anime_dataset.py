@@ -1,7 +1,12 @@
+import hashlib
 import json
 import random
 import os
 from typing import List, Dict, Any, Optional, Tuple
+from anime_index import AnimeIndex, anime_title, file_hash
+
+# metadata_path extensions of an SQLite index (see anime_index.py) rather than a metadata.json
+INDEX_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
 
 class AnimeDataset:
     def __init__(self, dataset_root: str, metadata_path: str):
@@ -10,17 +15,27 @@ class AnimeDataset:
         
         Args:
             dataset_root: Root directory containing the anime images
-            metadata_path: Path to the metadata.json file
+            metadata_path: Path to the metadata.json file, or to an SQLite index
+                (.db) which is queried on demand instead of being loaded whole
         """
         self.dataset_root = dataset_root
         self.metadata_path = metadata_path
-        self.metadata = self._load_metadata()
+        if metadata_path.lower().endswith(INDEX_EXTENSIONS):
+            self.index = AnimeIndex(metadata_path)
+            self.metadata = None
+        else:
+            self.index = None
+            self.metadata = self._load_metadata()
+        self._thumbnails = None  # absolute image path -> thumbnail pyramid, built on first use
+        self._version = None
         
     def _load_metadata(self) -> Dict[str, Any]:
         with open(self.metadata_path, 'r') as f:
             return json.load(f)
     
     def get_anime_list(self) -> List[str]:
+        if self.index is not None:
+            return self.index.anime_list()
         return list(self.metadata.keys())
     
     # def get_characters_for_anime(self, anime_name: str) -> List[str]:
@@ -31,42 +46,97 @@ class AnimeDataset:
     #     return list(self.metadata[anime_name]["characters"].keys())
     
     def get_anime_image_paths(self, anime_name: str) -> List[str]:
-        if (anime_name not in self.metadata):
+        if self.index is not None:
+            relative_paths = self.index.image_paths(anime_name)
+        elif (anime_name not in self.metadata):
             return []
-        
-        relative_paths = self.metadata[anime_name]["data"]["images"]
+        else:
+            relative_paths = self.metadata[anime_name]["data"]["images"]
         absolute_paths = [os.path.join(self.dataset_root, path) for path in relative_paths]
         return absolute_paths
     
-    def get_random_anime_image(self, anime_name: Optional[str] = None) -> str:
+    def get_image_source(self, image_path: str, width: int, height: int) -> str:
+        """
+        Path of the smallest thumbnail of an image that still covers a width x height cell
+        
+        Falls back to the image itself when it has no thumbnails (see
+        anime_metadataGen.generate_thumbnails) or none is large enough.
+        """
+        if self.index is not None:
+            levels = self.index.thumbnail_levels(os.path.relpath(image_path, self.dataset_root))
+        else:
+            if self._thumbnails is None:
+                self._thumbnails = {
+                    os.path.join(self.dataset_root, path): entry
+                    for anime in self.metadata.values()
+                    for path, entry in anime["data"].get("thumbnails", {}).items()
+                }
+            entry = self._thumbnails.get(image_path)
+            levels = sorted(entry["levels"].values(), key=lambda level: level["size"][0]) if entry else []
+        
+        for level in levels:
+            level_width, level_height = level["size"]
+            if level_width >= width and level_height >= height:
+                return os.path.join(self.dataset_root, level["path"])
+        return image_path
+    
+    def version(self) -> str:
+        """
+        Identifies the dataset's content, for caches of what was generated from it
+        
+        A hash of the dataset root and of the metadata file, or of the paths
+        and file hashes in the index. Computed once per AnimeDataset.
+        """
+        if self._version is None:
+            content = self.index.version() if self.index is not None else file_hash(self.metadata_path)
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(os.path.abspath(self.dataset_root).encode())
+            digest.update(content.encode())
+            self._version = digest.hexdigest()
+        return self._version
     
+    def get_random_anime_image(self, anime_name: Optional[str] = None,
+                               rng: Optional[random.Random] = None) -> str:
+        """Random image of an anime (or of any anime), drawn from rng if given, else the random module"""
+        if rng is None:
+            rng = random
+        
         if anime_name:
             image_paths = self.get_anime_image_paths(anime_name)
             if not image_paths:
                 raise ValueError(f"No images found for {anime_name}")
-            return random.choice(image_paths)
+            return rng.choice(image_paths)
         
-        anime = random.choice(self.get_anime_list())
-        return self.get_random_anime_image(anime)
+        anime = rng.choice(self.get_anime_list())
+        return self.get_random_anime_image(anime, rng)
     
     def get_anime_info(self, anime_name: str) -> Dict[str, Any]:
+        if self.index is not None:
+            relative_paths = self.index.image_paths(anime_name)
+            return {"name": anime_title(anime_name), "images": relative_paths} if relative_paths else {}
+        
         if (anime_name not in self.metadata):
             return {}
         
         return self.metadata[anime_name]["data"]
     
     def get_random_character_set(self, count: int,
-                               from_same_anime: bool = False) -> List[Tuple[str, str]]:
+                               from_same_anime: bool = False,
+                               rng: Optional[random.Random] = None) -> List[Tuple[str, str]]:
         """
         Get a set of random characters
         
         Args:
             count: Number of characters to return
             from_same_anime: If True, all characters will be from the same anime
+            rng: Random generator to draw from, the random module by default
             
         Returns:
             List of tuples (anime_name, image_path)
         """
+        if rng is None:
+            rng = random
+        
         if from_same_anime:
             # Pick a random anime with enough characters
             valid_animes = [
@@ -77,8 +147,8 @@ class AnimeDataset:
             if not valid_animes:
                 raise ValueError(f"No valid anime found")
                 
-            anime = random.choice(valid_animes)
-            images = random.sample(self.get_anime_image_paths(anime), count)
+            anime = rng.choice(valid_animes)
+            images = rng.sample(self.get_anime_image_paths(anime), count)
             
             return [(anime, images)]
                 
@@ -88,8 +158,8 @@ class AnimeDataset:
             available_animes = self.get_anime_list()
             
             for _ in range(count):
-                anime = random.choice(available_animes)
-                image_path = self.get_random_anime_image(anime)
+                anime = rng.choice(available_animes)
+                image_path = self.get_random_anime_image(anime, rng)
                 result.append((anime, image_path))
                 
             return result
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Incremental SQLite index of the anime dataset
+
+An alternative to metadata.json for large datasets: update_index() only
+decodes the images that were added or changed since the last run (by
+modification time and file size) and drops the ones that were removed, and
+AnimeDataset queries the index on demand instead of loading it whole.
+
+For every image the index stores its dimensions, aspect ratio, mean colour,
+a hash of the file and its thumbnail pyramid (see
+anime_metadataGen.write_thumbnails).
+
+Usage:
+    python anime_index.py anime_dataset --db anime_index.db
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+
+from anime_metadataGen import THUMBNAIL_LEVELS, write_thumbnails
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,  -- relative to the dataset root
+    anime TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    file_size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    aspect_ratio REAL NOT NULL,
+    mean_r REAL NOT NULL,
+    mean_g REAL NOT NULL,
+    mean_b REAL NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_anime ON images (anime);
+CREATE TABLE IF NOT EXISTS thumbnails (
+    image_path TEXT NOT NULL REFERENCES images (path) ON DELETE CASCADE,
+    level INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    PRIMARY KEY (image_path, level)
+);
+"""
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def anime_title(anime: str) -> str:
+    return anime.replace("_", " ").title()
+
+
+class AnimeIndex:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    # Queries used by AnimeDataset
+
+    def anime_list(self) -> List[str]:
+        rows = self.connection.execute("SELECT DISTINCT anime FROM images ORDER BY anime")
+        return [anime for anime, in rows]
+
+    def image_paths(self, anime: str) -> List[str]:
+        rows = self.connection.execute("SELECT path FROM images WHERE anime = ? ORDER BY path", (anime,))
+        return [path for path, in rows]
+
+    def image_info(self, image_path: str) -> Optional[Dict[str, Any]]:
+        cursor = self.connection.execute("SELECT * FROM images WHERE path = ?", (image_path,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def thumbnail_levels(self, image_path: str) -> List[Dict[str, Any]]:
+        """Thumbnails of an image, smallest first"""
+        rows = self.connection.execute(
+            "SELECT path, width, height FROM thumbnails WHERE image_path = ? ORDER BY level",
+            (image_path,)
+        )
+        return [{"path": path, "size": [width, height]} for path, width, height in rows]
+
+    def version(self) -> str:
+        """Hash of the indexed paths and file hashes, changes whenever an image is added, changed or removed"""
+        digest = hashlib.blake2b(digest_size=16)
+        for path, image_hash in self.connection.execute("SELECT path, hash FROM images ORDER BY path"):
+            digest.update(f"{path}\0{image_hash}\n".encode())
+        return digest.hexdigest()
+
+    # Indexing
+
+    def update(self, dataset_path: str, thumbnail_dir: Optional[str] = None,
+               levels=THUMBNAIL_LEVELS, max_workers: Optional[int] = None,
+               batch_size: int = 500) -> Dict[str, int]:
+        """
+        Bring the index up to date with the files under dataset_path
+
+        Only added and changed images (different mtime or size) are decoded,
+        on a thread pool, and committed in batches so an interrupted run keeps
+        its progress. Returns the number of added, changed and removed images.
+        """
+        if thumbnail_dir is None:
+            thumbnail_dir = os.path.join(dataset_path, ".thumbnails")
+
+        indexed = {
+            path: (mtime, file_size)
+            for path, mtime, file_size in self.connection.execute("SELECT path, mtime, file_size FROM images")
+        }
+
+        # (relative path, anime, stat) of every image file, with a single stat each
+        found = {}
+        for anime_entry in os.scandir(dataset_path):
+            if not anime_entry.is_dir() or anime_entry.name.startswith('.'):
+                continue
+            for entry in os.scandir(anime_entry.path):
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    found[str(Path(anime_entry.name) / entry.name)] = (anime_entry.name, entry.stat())
+
+        removed = [path for path in indexed if path not in found]
+        pending = [
+            (path, anime, stat) for path, (anime, stat) in found.items()
+            if indexed.get(path) != (stat.st_mtime, stat.st_size)
+        ]
+        counts = {
+            'added': sum(path not in indexed for path, _, _ in pending),
+            'changed': sum(path in indexed for path, _, _ in pending),
+            'removed': len(removed),
+        }
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in removed])
+
+        def analyze(item):
+            path, anime, stat = item
+            source = os.path.join(dataset_path, path)
+            image = cv2.imread(source)
+            if image is None:
+                print(f"Warning: Failed to load image at {source}")
+                return None
+            height, width = image.shape[:2]
+            mean_b, mean_g, mean_r = cv2.mean(image)[:3]
+            thumbnails = write_thumbnails(image, path, dataset_path, thumbnail_dir, levels)
+            row = (path, anime, stat.st_mtime, stat.st_size, width, height, width / height,
+                   mean_r, mean_g, mean_b, file_hash(source))
+            return row, thumbnails
+
+        # OpenCV releases the GIL while decoding, the database is only written from this thread
+        with ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1)) as executor:
+            for start in range(0, len(pending), batch_size):
+                results = executor.map(analyze, pending[start:start + batch_size])
+                with self.connection:
+                    for result in results:
+                        if result is None:
+                            continue
+                        row, thumbnails = result
+                        self.connection.execute("DELETE FROM images WHERE path = ?", (row[0],))
+                        self.connection.execute(
+                            "INSERT INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+                        )
+                        self.connection.executemany(
+                            "INSERT INTO thumbnails VALUES (?, ?, ?, ?, ?)",
+                            [(row[0], int(level), thumbnail["path"], *thumbnail["size"])
+                             for level, thumbnail in thumbnails.items()]
+                        )
+
+        return counts
+
+
+def update_index(dataset_path: str, db_path: str, **kwargs) -> Dict[str, int]:
+    index = AnimeIndex(db_path)
+    try:
+        return index.update(dataset_path, **kwargs)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally index the anime dataset into SQLite")
+    parser.add_argument('dataset_path', nargs='?',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anime_dataset'))
+    parser.add_argument('--db', default=None, help="index file (default: anime_index.db next to the dataset)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(os.path.dirname(os.path.abspath(args.dataset_path)), 'anime_index.db')
+    counts = update_index(args.dataset_path, db_path)
+    print(f"Index {db_path} updated: {counts['added']} added, "
+          f"{counts['changed']} changed, {counts['removed']} removed")
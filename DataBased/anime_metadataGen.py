@@ -1,6 +1,10 @@
 import os
 import json
 from pathlib import Path
+import cv2
+
+# Longest side in pixels of each thumbnail level, largest first
+THUMBNAIL_LEVELS = (1024, 512, 256, 128)
 
 def generate_anime_metadata(dataset_path):
     """
@@ -16,9 +20,9 @@ def generate_anime_metadata(dataset_path):
     """
     metadata = {}
     
-    # Get all anime directories
+    # Get all anime directories (hidden ones such as the thumbnail cache are skipped)
     anime_dirs = [d for d in os.listdir(dataset_path) 
-                  if os.path.isdir(os.path.join(dataset_path, d))]
+                  if os.path.isdir(os.path.join(dataset_path, d)) and not d.startswith('.')]
     
     for anime in anime_dirs:
         anime_path = os.path.join(dataset_path, anime)
@@ -48,6 +52,91 @@ def generate_anime_metadata(dataset_path):
     
     return metadata
 
+def write_thumbnails(image, image_path, dataset_path, thumbnail_dir, levels=THUMBNAIL_LEVELS):
+    """
+    Writes the thumbnail levels of one decoded image (image_path is relative to dataset_path)
+    
+    Returns: {"512": {"path": ..., "size": [w, h]}, ...} for the levels smaller than the image
+    """
+    anime = os.path.dirname(image_path)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    os.makedirs(os.path.join(thumbnail_dir, anime), exist_ok=True)
+    written = {}
+    for level in sorted(levels, reverse=True):
+        if level >= max(image.shape[:2]):
+            continue
+        scale = level / max(image.shape[:2])
+        # INTER_AREA averages the source pixels instead of skipping them (no aliasing)
+        image = cv2.resize(
+            image,
+            (max(round(image.shape[1] * scale), 1), max(round(image.shape[0] * scale), 1)),
+            interpolation=cv2.INTER_AREA
+        )
+        level_path = os.path.join(thumbnail_dir, anime, f"{stem}_{level}.jpg")
+        cv2.imwrite(level_path, image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        written[str(level)] = {
+            "path": os.path.relpath(level_path, dataset_path),
+            "size": [image.shape[1], image.shape[0]]
+        }
+    return written
+
+def generate_thumbnails(dataset_path, metadata, thumbnail_dir=None, levels=THUMBNAIL_LEVELS):
+    """
+    Writes a pyramid of downscaled copies of every image and records it in the metadata
+    
+    Each level is a JPEG whose longest side is one of `levels` (only levels
+    smaller than the original are made), each downscaled from the previous
+    one. A manifest in thumbnail_dir remembers the source modification times,
+    so only new or changed images are processed on later runs.
+    
+    Adds to each anime's data:
+    "thumbnails": {image path: {"size": [w, h], "levels": {"512": {"path": ..., "size": [w, h]}, ...}}}
+    with paths relative to dataset_path, like the image paths.
+    
+    Returns: Number of images processed
+    """
+    if thumbnail_dir is None:
+        thumbnail_dir = os.path.join(dataset_path, ".thumbnails")
+    manifest_path = os.path.join(thumbnail_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    processed = 0
+    seen = {}
+    
+    for anime, anime_data in metadata.items():
+        thumbnails = {}
+        for image_path in anime_data["data"]["images"]:
+            source = os.path.join(dataset_path, image_path)
+            source_mtime = os.path.getmtime(source)
+            entry = manifest.get(image_path)
+            
+            if entry is None or entry["mtime"] != source_mtime:
+                image = cv2.imread(source)
+                if image is None:
+                    print(f"Warning: Failed to load image at {source}")
+                    continue
+                
+                entry = {
+                    "mtime": source_mtime,
+                    "size": [image.shape[1], image.shape[0]],
+                    "levels": write_thumbnails(image, image_path, dataset_path, thumbnail_dir, levels)
+                }
+                manifest[image_path] = entry
+                processed += 1
+            
+            seen[image_path] = entry
+            thumbnails[image_path] = {"size": entry["size"], "levels": entry["levels"]}
+        anime_data["data"]["thumbnails"] = thumbnails
+    
+    # Images that were removed from the dataset are dropped from the manifest
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(seen, f)
+    
+    return processed
+
 def save_metadata(metadata, output_path="D:/Courses/UdeM IFT6251_AlgorithmicArt/Cours_1_work/SWArt Works/DataBased/metadata.json"):
     """Saves the metadata dictionary to a JSON file"""
     with open(output_path, 'w') as f:
@@ -59,6 +148,8 @@ if __name__ == "__main__":
     dataset_path = "D:/Courses/UdeM IFT6251_AlgorithmicArt/Cours_1_work/SWArt Works/DataBased/anime_dataset"
     
     metadata = generate_anime_metadata(dataset_path)
+    processed = generate_thumbnails(dataset_path, metadata)
+    print(f"Thumbnails generated for {processed} new or changed images")
     save_metadata(metadata)
     
     # Print some statistics
@@ -1,11 +1,11 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtCore import Qt
 from vispy import scene
-import cv2
 import sys
 import os
 import random
 from anime_dataset import AnimeDataset
+from image_loader import shared_cache
 
 class AnimeCharacterGrid(QMainWindow):
     def __init__(self, dataset, grid_size, window_size):
@@ -48,11 +48,13 @@ class AnimeCharacterGrid(QMainWindow):
                 if char_idx < len(self.character_images):
                     _, image_path = self.character_images[char_idx]
                     
-                    # Load and convert image
-                    image = cv2.imread(image_path)
+                    # Load and convert image (decoded images are cached across grids)
+                    image = shared_cache.load_image(self.dataset.get_image_source(
+                        image_path,
+                        self.window_size[0] // self.grid_size[1],
+                        self.window_size[1] // self.grid_size[0]
+                    ))
                     if image is not None:
-                        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                        
                         # Create view for this grid cell
                         view = grid.add_view(row=i, col=j, border_color='white')
                         image_visual = scene.visuals.Image(image, parent=view.scene)
@@ -1,85 +1,27 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QSlider, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QFileDialog
-from PyQt5.QtCore import Qt, QTimer, QUrl
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QSlider, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QFileDialog, QInputDialog, QMessageBox
+from PyQt5.QtCore import Qt, QTimer, QUrl, pyqtSignal
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from vispy import scene, app
 import cv2
 import sys
 import os
 import random
+import threading
 import numpy as np
-import time
 from anime_dataset import AnimeDataset
-
-class GridCell:
-    """Represents a cell in the poster grid with position and size information"""
-    def __init__(self, x, y, width, height, weight=1.0):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.weight = weight  # Importance weight for the image
-
-class PosterLayoutGenerator:
-    
-    def __init__(self, canvas_width, canvas_height, min_cell_width=0.2, min_cell_height=0.2):
-        self.canvas_width = canvas_width
-        self.canvas_height = canvas_height
-        self.min_cell_width_frac = min_cell_width
-        self.min_cell_height_frac = min_cell_height
-        
-    def generate_variable_grid(self, complexity=0.5):
-        min_cell_width = int(self.canvas_width * self.min_cell_width_frac)
-        min_cell_height = int(self.canvas_height * self.min_cell_height_frac)
-        
-        cells = [GridCell(0, 0, self.canvas_width, self.canvas_height)]
-        
-        num_splits = int(5 + complexity * 15)
-        
-        for _ in range(num_splits):
-            if not cells:
-                break
-                
-            cell_weights = [cell.width * cell.height for cell in cells]
-            cell_index = random.choices(range(len(cells)), weights=cell_weights)[0]
-            cell = cells.pop(cell_index)
-            
-            if cell.width >= cell.height:
-                split_horizontal = True
-            elif cell.width < cell.height:
-                split_horizontal = False
-            
-            if split_horizontal and cell.width < min_cell_width * 2:
-                cells.append(cell)  # Put it back
-            elif not split_horizontal and cell.height < min_cell_height * 2:
-                cells.append(cell)  # Put it back
-            
-            margin = 0.3
-            if split_horizontal:
-                min_split = int(cell.width * margin)
-                max_split = int(cell.width * (1 - margin))
-                if max_split <= min_split:
-                    split_pos = cell.width // 2
-                else:
-                    split_pos = random.randint(min_split, max_split)
-                    
-                cells.append(GridCell(cell.x, cell.y, split_pos, cell.height))
-                cells.append(GridCell(cell.x + split_pos, cell.y, cell.width - split_pos, cell.height))
-            else:
-                min_split = int(cell.height * margin)
-                max_split = int(cell.height * (1 - margin))
-                if max_split <= min_split:
-                    split_pos = cell.height // 2
-                else:
-                    split_pos = random.randint(min_split, max_split)
-                    
-                cells.append(GridCell(cell.x, cell.y, cell.width, split_pos))
-                cells.append(GridCell(cell.x, cell.y + split_pos, cell.width, cell.height - split_pos))
-            
-        return cells
-
+from poster_layout import GridCell, LayoutCache, assign_images, generate_layout
+from image_loader import ImageLoader, shared_cache
+from poster_visual import Poster
+from poster_batch import scale_cells
+from poster_export import export_poster as export_tiled_poster, image_sources
 
 class AnimePosterGenerator(QMainWindow):
-    def __init__(self, dataset, window_size, use_variable_grid=True, complexity=0.7):
+    # (load generation, tiles) from the image loader threads, delivered on the GUI thread
+    tiles_ready = pyqtSignal(int, list)
+    # (file path, error message or '' on success) from the print export thread
+    export_finished = pyqtSignal(str, str)
+
+    def __init__(self, dataset, window_size, use_variable_grid=True, complexity=0.7, seed=None):
         super().__init__()
         self.dataset = dataset
         self.window_size = window_size
@@ -91,12 +33,9 @@ class AnimePosterGenerator(QMainWindow):
         self.animation_speed = 0.02
         self.animation_scale_factor = 0.1
         self.enable_audio = False
-        self.last_frame_time = 0
-        self.animation_value = 0.0
         
         if use_variable_grid:
-            self.layout_generator = PosterLayoutGenerator(window_size[0], window_size[1])
-            self.grid_cells = self.layout_generator.generate_variable_grid(complexity)
+            self.grid_cells = []  # drawn from the poster's seed
         else:
             # Create regular grid
             rows, cols = 3, 3
@@ -112,51 +51,35 @@ class AnimePosterGenerator(QMainWindow):
         
         self.media_player = QMediaPlayer()
         
-        self.images = self.assign_images_to_cells()
+        # Tiles are decoded and fitted off the GUI thread, and cached for later posters
+        self.image_loader = ImageLoader(cache=shared_cache)
+        self.load_generation = 0
+        self.tiles_ready.connect(self.show_tiles)
+        self.export_finished.connect(self.show_export_result)
+        
+        # Every poster is determined by its seed; generated posters are kept in the
+        # layout cache, so going back through the history doesn't generate them again
+        self.layout_cache = LayoutCache(os.path.join(dataset.dataset_root, '.posters'))
+        self.history = [random.randrange(2 ** 31) if seed is None else seed]
+        self.history_index = 0
+        self.set_seed(self.history[0])
         
         self.init_ui()
         
+        # Only runs while the animation is on
         self.animation_timer = QTimer(self)
         self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_timer.start(16)  # ~60fps
-        
-    def assign_images_to_cells(self):
-        images = []
-        
-        num_cells = len(self.grid_cells)
-        
-        use_same_anime = random.random() < 0.3
-        
-        # Get random anime images
-        try:
-            if use_same_anime:
-                anime_list = self.dataset.get_anime_list()
-                for anime in random.sample(anime_list, len(anime_list)):
-                    all_images = self.dataset.get_anime_image_paths(anime)
-                    if len(all_images) >= num_cells:
-                        selected_images = random.sample(all_images, num_cells)
-                        images = [(anime, path) for path in selected_images]
-                        break
-                
-                if not images:
-                    use_same_anime = False
-            
-            if not use_same_anime:
-                anime_list = self.dataset.get_anime_list()
-                for _ in range(num_cells):
-                    anime = random.choice(anime_list)
-                    image_path = self.dataset.get_random_anime_image(anime)
-                    images.append((anime, image_path))
-        
-        except ValueError as e:
-            print(f"Warning: {e}. Falling back to mixed anime selection.")
-            anime_list = self.dataset.get_anime_list()
-            for _ in range(num_cells):
-                anime = random.choice(anime_list)
-                image_path = self.dataset.get_random_anime_image(anime)
-                images.append((anime, image_path))
-                
-        return images
+        
+    def set_seed(self, seed):
+        # Cells and images of the seed's poster, shown by the next create_image_visuals()
+        self.seed = seed
+        if self.use_variable_grid:
+            self.grid_cells, self.images = generate_layout(
+                self.dataset, seed, self.window_size, self.complexity, self.layout_cache
+            )
+        else:
+            self.images = assign_images(self.dataset, len(self.grid_cells), random.Random(seed))
+        self.setWindowTitle(f'Anime Poster Generator (seed {seed})')
         
     def init_ui(self):
         central_widget = QWidget()
@@ -170,6 +93,8 @@ class AnimePosterGenerator(QMainWindow):
         # Crucial
         self.view.camera.set_range(x=(0, self.window_size[0]), y=(0, self.window_size[1]), margin=0)
         
+        self.poster = Poster(self.window_size, parent=self.view.scene)
+        
         main_layout.addWidget(self.canvas.native, 1)
         
         control_panel = QWidget()
@@ -204,120 +129,88 @@ class AnimePosterGenerator(QMainWindow):
         audio_layout.addWidget(load_audio_btn)
         control_layout.addLayout(audio_layout)
         
-        # Regenerate button
+        # History and regenerate buttons
+        previous_btn = QPushButton("Previous Poster")
+        previous_btn.clicked.connect(self.previous_poster)
+        control_layout.addWidget(previous_btn)
+        
         regenerate_btn = QPushButton("Generate New Poster")
         regenerate_btn.clicked.connect(self.regenerate_poster)
         control_layout.addWidget(regenerate_btn)
         
+        next_btn = QPushButton("Next Poster")
+        next_btn.clicked.connect(self.next_poster)
+        control_layout.addWidget(next_btn)
+        
         # Export button
         export_btn = QPushButton("Export Image")
         export_btn.clicked.connect(self.export_poster)
         control_layout.addWidget(export_btn)
         
+        # Print resolution export, rendered in tiles
+        export_print_btn = QPushButton("Export Print")
+        export_print_btn.clicked.connect(self.export_print)
+        control_layout.addWidget(export_print_btn)
+        
         main_layout.addWidget(control_panel)
         
         self.setCentralWidget(central_widget)
         
-        self.setWindowTitle('Anime Poster Generator')
+        self.setWindowTitle(f'Anime Poster Generator (seed {self.seed})')
         self.setGeometry(700, 800, self.window_size[0], self.window_size[1] + 100)
         
         self.create_image_visuals()
     
     def create_image_visuals(self):
-        self.image_visuals = []
-        
-        for i, (cell, (anime, image_path)) in enumerate(zip(self.grid_cells, self.images)):
-            # Load and process image
-            try:
-                image = cv2.imread(image_path)
-                if image is None:
-                    print(f"Warning: Failed to load image at {image_path}")
-                    continue
-                
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image = np.flipud(image)
-                
-                img_height, img_width, _ = image.shape
-                
-                width_ratio = cell.width / img_width
-                height_ratio = cell.height / img_height
-                
-                scale_ratio = max(width_ratio, height_ratio)
-                
-                new_width = int(img_width * scale_ratio)
-                new_height = int(img_height * scale_ratio)
-                
-                resized_image = cv2.resize(image, (new_width, new_height))
-                
-                if new_width > cell.width or new_height > cell.height:
-                    start_x = (new_width - cell.width) // 2 if new_width > cell.width else 0
-                    start_y = (new_height - cell.height) // 2 if new_height > cell.height else 0
-                    
-                    cropped_image = resized_image[
-                        start_y:start_y + min(cell.height, new_height),
-                        start_x:start_x + min(cell.width, new_width)
-                    ]
-                    final_image = cropped_image
-                else:
-                    final_image = resized_image
-                
-                # Create image visual
-                image_visual = scene.visuals.Image(
-                    final_image, 
-                    parent=self.view.scene
-                )
-                
-                # Position the image
-                image_visual.transform = scene.transforms.STTransform(
-                    translate=(cell.x, cell.y)
-                )
-                
-                self.image_visuals.append((image_visual, cell))
-                
-            except Exception as e:
-                print(f"Error processing image {image_path}: {e}")
+        # Start loading the tiles of the current cells; show_tiles() replaces the
+        # visuals once all are ready, so the window stays responsive meanwhile
+        self.load_generation += 1
+        generation = self.load_generation
+        
+        # Thumbnails that still cover the cells are decoded instead of the full images
+        requests = [(self.dataset.get_image_source(image_path, cell.width, cell.height),
+                     cell.width, cell.height)
+                    for cell, (anime, image_path) in zip(self.grid_cells, self.images)]
+        self.image_loader.load_tiles_async(
+            requests, lambda tiles: self.tiles_ready.emit(generation, tiles)
+        )
     
-    def update_animation(self):
-        # Calculate delta time for smooth animation regardless of frame rate
-        current_time = time.time()
-        dt = current_time - self.last_frame_time
-        self.last_frame_time = current_time
+    def show_tiles(self, generation, tiles):
+        if generation != self.load_generation:
+            return  # a newer poster was requested meanwhile
+        
+        for (anime, image_path), tile in zip(self.images, tiles):
+            if tile is None:
+                print(f"Warning: Failed to load image at {image_path}")
         
+        # All tiles go into the poster's single texture; unchanged cells aren't uploaded again
+        self.poster.set_tiles(self.grid_cells, tiles)
+    
+    def update_animation(self):
         if not self.enable_animation:
             return
         
-        self.animation_value += self.animation_speed * dt * 60  # Normalize to 60fps
-        
-        while self.animation_value > 1.0:
-            self.animation_value -= 1.0
-            
-        scale_factor = 1.0 + self.animation_scale_factor * (0.5 + 0.5 * np.sin(self.animation_value * 2 * np.pi))
-        
-        for visual, cell in self.image_visuals:
-            center_x = cell.x + cell.width / 2
-            center_y = cell.y + cell.height / 2
-            
-            transform = (
-                scene.transforms.STTransform(translate=(center_x, center_y)) *
-                scene.transforms.STTransform(scale=(scale_factor, scale_factor)) *
-                scene.transforms.STTransform(translate=(-center_x, -center_y)) *
-                scene.transforms.STTransform(translate=(cell.x, cell.y))
-            )
-            
-            visual.transform = transform
-        
-        self.canvas.update()
+        # The pulse is evaluated in the poster's vertex shader, only its clock advances here
+        self.poster.tick()
     
     def toggle_animation(self):
         self.enable_animation = not self.enable_animation
         self.animation_btn.setText(f"Animation: {'ON' if self.enable_animation else 'OFF'}")
         
         if self.enable_animation:
-            self.last_frame_time = time.time()
-            self.animation_value = 0.0
+            self.poster.set_pulse(self.pulse_frequency(), self.animation_scale_factor, phase=0.0)
+            self.animation_timer.start(16)  # ~60fps
+        else:
+            self.animation_timer.stop()
+    
+    def pulse_frequency(self):
+        # animation_speed is in cycles per 60 fps frame
+        return self.animation_speed * 60
     
     def set_animation_speed(self, value):
         self.animation_speed = value / 1000.0  # Convert to reasonable range
+        if self.enable_animation:
+            self.poster.set_pulse(self.pulse_frequency(), self.animation_scale_factor)
     
     def toggle_audio(self):
         self.enable_audio = not self.enable_audio
@@ -343,18 +236,28 @@ class AnimePosterGenerator(QMainWindow):
                 self.media_player.play()
     
     def regenerate_poster(self):
-        # Clear previous visuals
-        for visual, _ in self.image_visuals:
-            visual.parent = None
-        
-        if self.use_variable_grid:
-            self.grid_cells = self.layout_generator.generate_variable_grid(self.complexity)
-        
-        self.images = self.assign_images_to_cells()
-        
+        # A new seed at the end of the history
+        self.history.append(random.randrange(2 ** 31))
+        self.show_history(len(self.history) - 1)
+    
+    def previous_poster(self):
+        if self.history_index > 0:
+            self.show_history(self.history_index - 1)
+    
+    def next_poster(self):
+        if self.history_index < len(self.history) - 1:
+            self.show_history(self.history_index + 1)
+    
+    def show_history(self, index):
+        # The previous visuals stay on screen until the new tiles are ready
+        self.history_index = index
+        self.set_seed(self.history[index])
         self.create_image_visuals()
     
-        self.canvas.update()
+    def closeEvent(self, event):
+        self.image_loader.shutdown()
+        print(f"Image cache: {self.image_loader.cache.stats()}")
+        super().closeEvent(event)
     
     def export_poster(self):
         file_path, _ = QFileDialog.getSaveFileName(
@@ -374,6 +277,46 @@ class AnimePosterGenerator(QMainWindow):
             
             cv2.imwrite(file_path, img)
             print(f"Poster exported to {file_path}")
+    
+    def export_print(self):
+        width, ok = QInputDialog.getInt(self, "Export Print", "Width in pixels:", 20000, 1000, 100000, 1000)
+        if not ok:
+            return
+        height = round(width * self.window_size[1] / self.window_size[0])
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Print Poster",
+            "",
+            "Tiled TIFF (*.tif *.tiff);;PNG (*.png)"
+        )
+        
+        if file_path:
+            if not file_path.lower().endswith(('.tif', '.tiff', '.png')):
+                file_path += '.tif'
+            # The window's cells scaled to the print size, rendered tile by tile off the GUI thread.
+            # Their image files are resolved here: the dataset's SQLite index belongs to this thread
+            size = (width, height)
+            cells = scale_cells(self.grid_cells, self.window_size, size)
+            sources = image_sources(self.dataset, cells, self.images)
+            
+            def export():
+                try:
+                    export_tiled_poster(cells, sources, size, file_path)
+                except Exception as e:
+                    self.export_finished.emit(file_path, str(e) or type(e).__name__)
+                else:
+                    self.export_finished.emit(file_path, '')
+            
+            print(f"Exporting a {width}x{height} poster to {file_path}...")
+            threading.Thread(target=export, name='poster-export').start()
+    
+    def show_export_result(self, file_path, error):
+        if error:
+            print(f"Error exporting {file_path}: {error}")
+            QMessageBox.warning(self, "Export Print", f"Could not export {file_path}:\n{error}")
+        else:
+            print(f"Poster exported to {file_path}")
 
 
 if __name__ == '__main__':
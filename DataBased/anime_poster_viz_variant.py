@@ -1,12 +1,12 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtCore import Qt, QTimer
 from vispy import scene, app
-import cv2
 import sys
 import os
 import random
-import numpy as np
+import time
 from anime_dataset import AnimeDataset
+from image_loader import load_and_fit_image, shared_cache
 
 class GridCell:
     """Represents a cell in the poster grid with position and size information"""
@@ -30,9 +30,11 @@ class PosterLayoutGenerator:
         self.min_cell_width_frac = min_cell_width
         self.min_cell_height_frac = min_cell_height
         
-    def generate_variable_grid(self, complexity=0.5):
+    def generate_variable_grid(self, complexity=0.5, rng=None):
         
-        # Approach: Binary space partitioning
+        # Approach: Binary space partitioning, drawing from rng (a random.Random) if given
+        if rng is None:
+            rng = random
         min_cell_width = int(self.canvas_width * self.min_cell_width_frac)
         min_cell_height = int(self.canvas_height * self.min_cell_height_frac)
         
@@ -46,7 +48,7 @@ class PosterLayoutGenerator:
                 break
                 
             cell_weights = [cell.width * cell.height for cell in cells]
-            cell_index = random.choices(range(len(cells)), weights=cell_weights)[0]
+            cell_index = rng.choices(range(len(cells)), weights=cell_weights)[0]
             cell = cells.pop(cell_index)
             
             # Split orientation
@@ -57,9 +59,11 @@ class PosterLayoutGenerator:
             
             if split_horizontal and cell.width < min_cell_width * 2:
                 cells.append(cell)
+                continue
     
             elif not split_horizontal and cell.height < min_cell_height * 2:
                 cells.append(cell)
+                continue
             
             # Split position
             margin = 0.3
@@ -69,7 +73,7 @@ class PosterLayoutGenerator:
                 if max_split <= min_split:
                     split_pos = cell.width // 2
                 else:
-                    split_pos = random.randint(min_split, max_split)
+                    split_pos = rng.randint(min_split, max_split)
                     
                 # New cells (horizontal split)
                 cells.append(GridCell(cell.x, cell.y, split_pos, cell.height))
@@ -80,7 +84,7 @@ class PosterLayoutGenerator:
                 if max_split <= min_split:
                     split_pos = cell.height // 2
                 else:
-                    split_pos = random.randint(min_split, max_split)
+                    split_pos = rng.randint(min_split, max_split)
                     
                 # New cells (vertical split)
                 cells.append(GridCell(cell.x, cell.y, cell.width, split_pos))
@@ -96,7 +100,7 @@ class PosterLayoutGenerator:
 
 class AnimePosterGenerator(QMainWindow):
     def __init__(self, dataset, window_size, use_variable_grid=True, complexity=0.7, 
-                 enable_animation=False):
+                 enable_animation=False, seed=None):
         super().__init__()
         self.dataset = dataset
         self.window_size = window_size
@@ -104,9 +108,13 @@ class AnimePosterGenerator(QMainWindow):
         self.complexity = complexity
         self.enable_animation = enable_animation
         
+        # The poster is determined by its seed
+        self.seed = random.randrange(2 ** 31) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        
         self.layout_generator = PosterLayoutGenerator(window_size[0], window_size[1])
         if use_variable_grid:
-            self.grid_cells = self.layout_generator.generate_variable_grid(complexity)
+            self.grid_cells = self.layout_generator.generate_variable_grid(complexity, self.rng)
         else:
             # Create regular grid (3x3 for example)
             rows, cols = 3, 3
@@ -129,25 +137,27 @@ class AnimePosterGenerator(QMainWindow):
         if self.enable_animation:
             self.animation_timer = QTimer(self)
             self.animation_timer.timeout.connect(self.update_animation)
-            self.animation_timer.start(0) 
+            self.animation_timer.start(16)  # ~60fps, a 0 ms timer would spin the event loop
             self.animation_step = 0
             self.animation_direction = 1  # 1 for growing, -1 for shrinking
+            self.animation_rate = 3.0  # steps per second (0.05 per frame at 60fps)
+            self.last_frame_time = time.perf_counter()
         
     def assign_images_to_cells(self):
         images = []
         
         num_cells = len(self.grid_cells)
         
-        use_same_anime = random.random() < 0.3  # 30% chance to use same anime
+        use_same_anime = self.rng.random() < 0.3  # 30% chance to use same anime
         
         try:
             if use_same_anime:
                 anime_list = self.dataset.get_anime_list()
-                for anime in random.sample(anime_list, len(anime_list)):
+                for anime in self.rng.sample(anime_list, len(anime_list)):
                     # Get all images for this anime
                     all_images = self.dataset.get_anime_image_paths(anime)
                     if len(all_images) >= num_cells:
-                        selected_images = random.sample(all_images, num_cells)
+                        selected_images = self.rng.sample(all_images, num_cells)
                         images = [(anime, path) for path in selected_images]
                         break
                 
@@ -157,16 +167,16 @@ class AnimePosterGenerator(QMainWindow):
             if not use_same_anime:
                 anime_list = self.dataset.get_anime_list()
                 for _ in range(num_cells):
-                    anime = random.choice(anime_list)
-                    image_path = self.dataset.get_random_anime_image(anime)
+                    anime = self.rng.choice(anime_list)
+                    image_path = self.dataset.get_random_anime_image(anime, self.rng)
                     images.append((anime, image_path))
         
         except ValueError as e:
             print(f"Warning: {e}. Falling back to mixed anime selection.")
             anime_list = self.dataset.get_anime_list()
             for _ in range(num_cells):
-                anime = random.choice(anime_list)
-                image_path = self.dataset.get_random_anime_image(anime)
+                anime = self.rng.choice(anime_list)
+                image_path = self.dataset.get_random_anime_image(anime, self.rng)
                 images.append((anime, image_path))
         
         return images
@@ -178,7 +188,7 @@ class AnimePosterGenerator(QMainWindow):
         self.view.camera = scene.PanZoomCamera(aspect=1)
         self.view.camera.set_range(x=(0, self.window_size[0]), y=(0, self.window_size[1]), margin=0)
         
-        self.setWindowTitle('Anime Poster Generator')
+        self.setWindowTitle(f'Anime Poster Generator (seed {self.seed})')
         self.setGeometry(700, 800, self.window_size[0], self.window_size[1])
         
         self.image_visuals = []
@@ -193,54 +203,26 @@ class AnimePosterGenerator(QMainWindow):
                 image_visual.transform = scene.transforms.STTransform(
                     translate=(cell.x, cell.y)
                 )
-                self.image_visuals.append(image_visual)
+                # Kept with its cell, its transform is updated in place by the animation
+                self.image_visuals.append((image_visual, cell))
             else:
                 print(f"Warning: Failed to load image at {image_path}")
         
         self.setCentralWidget(self.canvas.native)
         
     def load_and_fit_image(self, image_path, cell):
-        try:
-            image = cv2.imread(image_path)
-            if image is None:
-                return None
-                
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image = np.flipud(image)
-
-            img_height, img_width, _ = image.shape
-            
-            width_ratio = cell.width / img_width
-            height_ratio = cell.height / img_height
-            
-            scale_ratio = max(width_ratio, height_ratio)
-            
-            new_width = int(img_width * scale_ratio)
-            new_height = int(img_height * scale_ratio)
-            
-            resized_image = cv2.resize(image, (new_width, new_height))
-            
-            if new_width > cell.width or new_height > cell.height:
-                start_x = (new_width - cell.width) // 2 if new_width > cell.width else 0
-                start_y = (new_height - cell.height) // 2 if new_height > cell.height else 0
-                
-                cropped_image = resized_image[
-                    start_y:start_y + min(cell.height, new_height),
-                    start_x:start_x + min(cell.width, new_width)
-                ]
-                return cropped_image
-            
-            return resized_image
-            
-        except Exception as e:
-            print(f"Error processing image {image_path}: {e}")
-            return None
+        source = self.dataset.get_image_source(image_path, cell.width, cell.height)
+        return load_and_fit_image(source, cell.width, cell.height, cache=shared_cache)
     
     def update_animation(self):
         if not self.enable_animation:
             return
             
-        self.animation_step += 0.05 * self.animation_direction
+        # Advance with the elapsed time, so the pulse speed doesn't depend on the frame rate
+        current_time = time.perf_counter()
+        dt = current_time - self.last_frame_time
+        self.last_frame_time = current_time
+        self.animation_step += self.animation_rate * dt * self.animation_direction
         
         if self.animation_step > 1.0:
             self.animation_direction = -1
@@ -249,20 +231,16 @@ class AnimePosterGenerator(QMainWindow):
         
         scale_factor = 1.0 + 0.1 * self.animation_step  # 1.0 and 1.1
         
-        for i, visual in enumerate(self.image_visuals):
-            cell = self.grid_cells[i]
-            
+        for visual, cell in self.image_visuals:
             center_x = cell.x + cell.width / 2
             center_y = cell.y + cell.height / 2
             
-            transform = (
-                scene.transforms.STTransform(translate=(center_x, center_y)) *
-                scene.transforms.STTransform(scale=(scale_factor, scale_factor)) *
-                scene.transforms.STTransform(translate=(-center_x, -center_y)) *
-                scene.transforms.STTransform(translate=(cell.x, cell.y))
+            # Scaling about the cell's centre, as a single scale + translate
+            visual.transform.scale = (scale_factor, scale_factor)
+            visual.transform.translate = (
+                center_x + scale_factor * (cell.x - center_x),
+                center_y + scale_factor * (cell.y - center_y)
             )
-            
-            visual.transform = transform
         
         self.canvas.update()
 
@@ -7,10 +7,10 @@ from PyQt5.QtGui import QPixmap, QImage
 # from PyQt5.QtCore import Qt
 from vispy import scene
 import os
-import cv2
 # import numpy as np
 import random
 import sys
+from image_loader import shared_cache
 
 class DisplayImagesInGrid(QMainWindow):
     def __init__(self, image_folder, grid_size, window_size):
@@ -45,8 +45,10 @@ class DisplayImagesInGrid(QMainWindow):
 
         for i in range(self.grid_size[0]):
             for j in range(self.grid_size[1]):
-                image = cv2.imread(self.image_grid[i][j])
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                image = shared_cache.load_image(self.image_grid[i][j])
+                if image is None:
+                    print(f"Warning: Failed to load image at {self.image_grid[i][j]}")
+                    continue
                 
                 view = grid.add_view(row=i, col=j, border_color='white')
                 image_visual = scene.visuals.Image(image, parent=view.scene)
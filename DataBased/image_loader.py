@@ -0,0 +1,236 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# (image_path, cell width, cell height)
+TileRequest = Tuple[str, int, int]
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def fit_geometry(img_width: int, img_height: int, width: int, height: int) -> Tuple[int, int, int, int]:
+    """(scaled width, scaled height, crop x, crop y) of fit_image for a width x height cell"""
+    scale_ratio = max(width / img_width, height / img_height)
+
+    # Rounded, not truncated: the scaled side that matches the cell must not come out a pixel short
+    new_width = round(img_width * scale_ratio)
+    new_height = round(img_height * scale_ratio)
+
+    start_x = (new_width - width) // 2 if new_width > width else 0
+    start_y = (new_height - height) // 2 if new_height > height else 0
+    return new_width, new_height, start_x, start_y
+
+
+def fit_image(image: np.ndarray, width: int, height: int, flip: bool = False) -> np.ndarray:
+    """
+    Scale an image to cover a width x height cell, then center-crop it to the cell
+
+    With flip, the tile is flipped vertically for vispy (row 0 at the bottom).
+    """
+    img_height, img_width = image.shape[:2]
+    new_width, new_height, start_x, start_y = fit_geometry(img_width, img_height, width, height)
+
+    resized_image = cv2.resize(image, (new_width, new_height))
+    if flip:
+        resized_image = np.flipud(resized_image)
+
+    if new_width > width or new_height > height:
+        resized_image = resized_image[
+            start_y:start_y + min(height, new_height),
+            start_x:start_x + min(width, new_width)
+        ]
+
+    return np.ascontiguousarray(resized_image)
+
+
+def fit_image_region(image: np.ndarray, width: int, height: int,
+                     x: int, y: int, region_width: int, region_height: int) -> np.ndarray:
+    """
+    The region_width x region_height region at (x, y) of fit_image(image, width, height)
+
+    Only the region is resampled, with the same bilinear mapping as the
+    resize, so a print-sized cell never has to exist in memory whole. x and y
+    are in tile pixels, row 0 at the top.
+    """
+    img_height, img_width = image.shape[:2]
+    new_width, new_height, start_x, start_y = fit_geometry(img_width, img_height, width, height)
+    # Source position of a tile pixel, as cv2.resize maps pixel centres
+    ratio_x = img_width / new_width
+    ratio_y = img_height / new_height
+    matrix = np.float64([
+        [ratio_x, 0, (start_x + x + 0.5) * ratio_x - 0.5],
+        [0, ratio_y, (start_y + y + 0.5) * ratio_y - 0.5],
+    ])
+    return cv2.warpAffine(image, matrix, (region_width, region_height),
+                          flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+
+
+def load_image(image_path: str) -> Optional[np.ndarray]:
+    """Decode an image as RGB, returns None if it can't be read"""
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+class ImageCache:
+    """
+    Thread-safe LRU cache of decoded images and fitted tiles, within a byte budget
+
+    Full images are stored under (path, None, None) and tiles under
+    (path, width, height); over budget, the least recently used full image is
+    evicted before any tile. Cached arrays are read-only, as they are shared.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self.lock:
+            image = self.entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: Hashable, image: np.ndarray):
+        """
+        Store an image, evicting the least recently used ones beyond the budget
+
+        The cache keeps a read-only view, the caller's array stays writable.
+        The image being stored is never the one evicted.
+        """
+        if image.nbytes > self.max_bytes:
+            return
+        image = image.view()
+        image.setflags(write=False)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.nbytes
+            self.entries[key] = image
+            self.size += image.nbytes
+            while self.size > self.max_bytes:
+                # Full images go first: a handful of them weigh as much as hundreds of tiles
+                others = [k for k in self.entries if k != key]
+                victim = next((k for k in others if k[1] is None), others[0])
+                self.size -= self.entries.pop(victim).nbytes
+                self.evictions += 1
+
+    def load_image(self, image_path: str) -> Optional[np.ndarray]:
+        """Decoded RGB image, from the cache if possible"""
+        key = (image_path, None, None)
+        image = self.get(key)
+        if image is None:
+            image = load_image(image_path)
+            if image is not None:
+                self.put(key, image)
+        return image
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.size}
+
+
+# Shared by all poster and grid windows of a process
+shared_cache = ImageCache()
+
+
+def load_and_fit_image(image_path: str, width: int, height: int,
+                       cache: Optional[ImageCache] = None) -> Optional[np.ndarray]:
+    """
+    Load an image and fit it to a cell, flipped for vispy; returns None if it can't be read
+
+    With a cache, fitted tiles and decoded images are reused.
+    """
+    key = (image_path, width, height)
+    if cache is not None:
+        tile = cache.get(key)
+        if tile is not None:
+            return tile
+
+    try:
+        image = cache.load_image(image_path) if cache is not None else load_image(image_path)
+        if image is None:
+            return None
+        tile = fit_image(image, width, height, flip=True)
+
+    except Exception as e:
+        print(f"Error processing image {image_path}: {e}")
+        return None
+
+    if cache is not None:
+        cache.put(key, tile)
+    return tile
+
+
+class ImageLoader:
+    """
+    Decodes and fits poster tiles on a thread pool
+
+    OpenCV releases the GIL while decoding and resizing, so the tiles of a
+    poster are prepared concurrently and the GUI thread only has to turn the
+    finished tiles into visuals.
+    """
+    def __init__(self, max_workers: Optional[int] = None, cache: Optional[ImageCache] = shared_cache):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(8, os.cpu_count() or 1),
+            thread_name_prefix='image-loader'
+        )
+
+    def load_tiles(self, requests: Sequence[TileRequest]) -> List[Optional[np.ndarray]]:
+        """Load and fit all tiles in parallel, blocking until they are ready (None for failures)"""
+        return list(self.executor.map(
+            lambda request: load_and_fit_image(*request, cache=self.cache), requests
+        ))
+
+    def load_tiles_async(self, requests: Sequence[TileRequest],
+                         callback: Callable[[List[Optional[np.ndarray]]], None]):
+        """
+        Load and fit all tiles in parallel without blocking
+
+        callback receives the tiles, in the order of requests, once the last
+        one is ready. It runs on a pool thread: GUI code must hand the result
+        over to its own thread (e.g. by emitting a Qt signal).
+        """
+        if not requests:
+            callback([])
+            return
+
+        futures = [self.executor.submit(load_and_fit_image, *request, cache=self.cache)
+                   for request in requests]
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def tile_done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and not any(future.cancelled() for future in futures):
+                callback([future.result() for future in futures])
+
+        for future in futures:
+            future.add_done_callback(tile_done)
+
+    def shutdown(self):
+        """Stop the pool, dropping the tiles that haven't started loading"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,173 @@
+"""
+Headless batch poster generation
+
+Builds posters with PosterLayoutGenerator and the dataset, composites them
+directly in NumPy/OpenCV at any output resolution (no window, no display
+server) and writes them to disk, rendering several posters at once on a
+process pool.
+
+Each poster is fully determined by its seed (given the dataset): the layout
+is generated on a canvas of the window's size (900 px on the longest side)
+and scaled to the output size, so a seed gives the same poster at preview
+and at print resolution. Posters already on disk are skipped, so an
+interrupted batch can simply be restarted, and every poster's seed, cells
+and images are appended to posters.jsonl in the output directory.
+
+Usage:
+    python poster_batch.py --count 1000 --size 7680 4320 --output posters
+    python poster_batch.py --seeds 7 42 --size 900 900 --output previews
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from anime_dataset import AnimeDataset
+from image_loader import ImageCache, fit_image, load_image
+from poster_layout import GridCell, generate_layout
+
+# Longest side of the canvas layouts are generated on, the poster window's size
+LAYOUT_SIZE = 900
+
+
+def layout_size(size: Tuple[int, int]) -> Tuple[int, int]:
+    """Size of the layout canvas with the aspect ratio of an output size"""
+    scale = LAYOUT_SIZE / max(size)
+    return max(round(size[0] * scale), 1), max(round(size[1] * scale), 1)
+
+
+def generate_poster(dataset: AnimeDataset, seed: int, size: Tuple[int, int],
+                    complexity: float = 0.7) -> Tuple[List[GridCell], List[Tuple[str, str]]]:
+    """Cells (in layout coordinates) and their (anime, image path) for a seed"""
+    return generate_layout(dataset, seed, layout_size(size), complexity)
+
+
+def scale_cells(cells: List[GridCell], from_size: Tuple[int, int],
+                to_size: Tuple[int, int]) -> List[GridCell]:
+    """Cells of a from_size canvas on a to_size canvas, edges rounded so neighbours still touch"""
+    sx = to_size[0] / from_size[0]
+    sy = to_size[1] / from_size[1]
+    scaled = []
+    for cell in cells:
+        x0, y0 = round(cell.x * sx), round(cell.y * sy)
+        x1, y1 = round((cell.x + cell.width) * sx), round((cell.y + cell.height) * sy)
+        scaled.append(GridCell(x0, y0, x1 - x0, y1 - y0, cell.weight))
+    return scaled
+
+
+def composite_poster(cells: List[GridCell], images: List[Tuple[str, str]], size: Tuple[int, int],
+                     dataset: AnimeDataset, cache: Optional[ImageCache] = None) -> np.ndarray:
+    """
+    Fit every image to its cell on a black (height, width, 3) RGB canvas
+
+    Cells are in poster coordinates (y up, as in the window), the canvas
+    rows go top to bottom like any image file.
+    """
+    width, height = size
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    for cell, (anime, image_path) in zip(cells, images):
+        if cell.width <= 0 or cell.height <= 0:
+            continue
+        source = dataset.get_image_source(image_path, cell.width, cell.height)
+        image = cache.load_image(source) if cache is not None else load_image(source)
+        if image is None:
+            print(f"Warning: Failed to load image at {image_path}")
+            continue
+        tile = fit_image(image, cell.width, cell.height)
+        top = height - (cell.y + cell.height)
+        canvas[top:top + tile.shape[0], cell.x:cell.x + tile.shape[1]] = tile
+    return canvas
+
+
+def poster_path(output_dir: str, seed: int, extension: str) -> str:
+    return os.path.join(output_dir, f"poster_{seed:06d}.{extension}")
+
+
+# Worker processes
+
+_dataset = None
+_cache = None
+
+
+def _init_worker(dataset_root: str, metadata_path: str, cache_bytes: int):
+    global _dataset, _cache
+    _dataset = AnimeDataset(dataset_root, metadata_path)
+    _cache = ImageCache(cache_bytes)
+
+
+def _render(seed: int, size: Tuple[int, int], complexity: float, path: str) -> dict:
+    start = time.perf_counter()
+    cells, images = generate_poster(_dataset, seed, size, complexity)
+    scaled = scale_cells(cells, layout_size(size), size)
+    canvas = composite_poster(scaled, images, size, _dataset, _cache)
+    tmp_path = path + '.tmp' + os.path.splitext(path)[1]
+    if not cv2.imwrite(tmp_path, cv2.cvtColor(canvas, cv2.COLOR_RGB2BGR)):
+        raise IOError(f"Could not write {path}")
+    os.replace(tmp_path, path)  # a poster file is never left half written
+    return {
+        'seed': seed,
+        'path': os.path.basename(path),
+        'size': list(size),
+        'complexity': complexity,
+        'cells': [[cell.x, cell.y, cell.width, cell.height] for cell in scaled],
+        'images': [os.path.relpath(image_path, _dataset.dataset_root) for _, image_path in images],
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def render_batch(seeds: List[int], size: Tuple[int, int], output_dir: str, dataset_root: str,
+                 metadata_path: str, complexity: float = 0.7, extension: str = 'png',
+                 workers: Optional[int] = None, cache_bytes: int = 256 * 1024 * 1024) -> int:
+    """Render the posters of seeds that aren't on disk yet, returns how many were rendered"""
+    os.makedirs(output_dir, exist_ok=True)
+    pending = [seed for seed in seeds if not os.path.exists(poster_path(output_dir, seed, extension))]
+    print(f"{len(seeds) - len(pending)} of {len(seeds)} posters already rendered")
+    if not pending:
+        return 0
+
+    rendered = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dataset_root, metadata_path, cache_bytes)) as executor, \
+            open(os.path.join(output_dir, 'posters.jsonl'), 'a') as manifest:
+        futures = [
+            executor.submit(_render, seed, size, complexity, poster_path(output_dir, seed, extension))
+            for seed in pending
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            manifest.write(json.dumps(record) + '\n')
+            manifest.flush()
+            rendered += 1
+            elapsed = time.perf_counter() - start
+            print(f"[{rendered}/{len(pending)}] {record['path']} "
+                  f"({record['seconds']:.2f} s, {rendered / elapsed:.2f} posters/s)")
+    return rendered
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Render posters without a display")
+    parser.add_argument('--dataset', default=os.path.join(here, 'anime_dataset'), help="dataset root")
+    parser.add_argument('--metadata', default=os.path.join(here, 'metadata.json'),
+                        help="metadata.json or anime_index.db")
+    parser.add_argument('--output', default='posters', help="output directory")
+    parser.add_argument('--size', type=int, nargs=2, default=(7680, 4320), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--count', type=int, default=10, help="number of posters, seeds --seed to --seed + count - 1")
+    parser.add_argument('--seed', type=int, default=0, help="first seed")
+    parser.add_argument('--seeds', type=int, nargs='+', help="explicit seeds instead of --seed/--count")
+    parser.add_argument('--complexity', type=float, default=0.7)
+    parser.add_argument('--format', choices=('png', 'jpg'), default='png')
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument('--cache-mb', type=int, default=256, help="image cache per process")
+    args = parser.parse_args()
+
+    seeds = args.seeds if args.seeds else list(range(args.seed, args.seed + args.count))
+    render_batch(seeds, tuple(args.size), args.output, args.dataset, args.metadata,
+                 complexity=args.complexity, extension=args.format, workers=args.workers,
+                 cache_bytes=args.cache_mb * 1024 * 1024)
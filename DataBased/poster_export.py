@@ -0,0 +1,208 @@
+"""
+Tiled export of posters at print resolution
+
+The poster window can only export what it shows (its 900 x 900 canvas).
+export_poster() renders a poster at any size, 20000 x 20000 and beyond, one
+tile at a time: each tile only resamples the parts of the images that fall
+inside it (image_loader.fit_image_region) and is written out before the next
+one is rendered, so memory stays bounded by the tile size and the image
+cache whatever the size of the poster.
+
+Two formats are written with the standard library alone:
+- .tif/.tiff: tiled BigTIFF, deflate-compressed, memory bounded by one tile
+- .png: streamed in bands of rows, memory bounded by one band (tile size x
+  poster width), for tools that don't read TIFF
+
+Usage:
+    python poster_export.py --seed 7 --size 20000 20000 --output poster_7.tif
+"""
+import argparse
+import os
+import struct
+import time
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from anime_dataset import AnimeDataset
+from image_loader import ImageCache, fit_image_region, load_image
+from poster_batch import generate_poster, layout_size, scale_cells
+from poster_layout import GridCell
+
+# Tile side, a multiple of 16 as TIFF requires
+TILE_SIZE = 1024
+
+
+def image_sources(dataset: AnimeDataset, cells: List[GridCell], images: List[Tuple[str, str]]) -> List[str]:
+    """
+    The file to decode for each cell (a thumbnail if one covers it), for render_region
+
+    Resolved up front, on the dataset's thread: an SQLite index can only be
+    queried from the thread that opened it, and the export may run on another.
+    """
+    return [dataset.get_image_source(image_path, cell.width, cell.height)
+            for cell, (anime, image_path) in zip(cells, images)]
+
+
+def render_region(cells: List[GridCell], sources: List[str], size: Tuple[int, int],
+                  cache: Optional[ImageCache], x: int, y: int, width: int, height: int) -> np.ndarray:
+    """
+    The width x height region at (x, y) of a poster, as an RGB array
+
+    x and y are image coordinates (row 0 at the top), cells are in poster
+    coordinates (y up, as in composite_poster), sources from image_sources().
+    """
+    region = np.zeros((height, width, 3), dtype=np.uint8)
+    for cell, source in zip(cells, sources):
+        left, top = cell.x, size[1] - (cell.y + cell.height)
+        x0, y0 = max(left, x), max(top, y)
+        x1, y1 = min(left + cell.width, x + width), min(top + cell.height, y + height)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        image = cache.load_image(source) if cache is not None else load_image(source)
+        if image is None:
+            if (x0, y0) == (left, top):  # once per cell, from the tile holding its corner
+                print(f"Warning: Failed to load image at {source}")
+            continue
+        region[y0 - y:y1 - y, x0 - x:x1 - x] = fit_image_region(
+            image, cell.width, cell.height, x0 - left, y0 - top, x1 - x0, y1 - y0
+        )
+    return region
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def write_png(path: str, size: Tuple[int, int], bands: Iterable[np.ndarray]):
+    """Write an 8-bit RGB PNG from bands of full rows, top to bottom, compressing as they come"""
+    width, height = size
+    compressor = zlib.compressobj(6)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        for band in bands:
+            # Every row starts with its filter type, 0 (none)
+            rows = np.zeros((band.shape[0], width * 3 + 1), dtype=np.uint8)
+            rows[:, 1:] = band.reshape(band.shape[0], width * 3)
+            data = compressor.compress(rows)
+            if data:
+                f.write(_png_chunk(b'IDAT', data))
+        f.write(_png_chunk(b'IDAT', compressor.flush()))
+        f.write(_png_chunk(b'IEND', b''))
+
+
+def write_bigtiff(path: str, size: Tuple[int, int], tiles: Iterable[np.ndarray], tile_size: int = TILE_SIZE):
+    """
+    Write an 8-bit RGB tiled BigTIFF from tile_size x tile_size tiles, row by row
+
+    Tiles on the right and bottom edges may be smaller, they are padded as
+    the format requires. The directory is written after the tiles, once
+    their offsets are known.
+    """
+    width, height = size
+    offsets, byte_counts = [], []
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<2sHHHQ', b'II', 43, 8, 0, 0))  # directory offset patched below
+        for tile in tiles:
+            if tile.shape[:2] != (tile_size, tile_size):
+                padded = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)
+                padded[:tile.shape[0], :tile.shape[1]] = tile
+                tile = padded
+            data = zlib.compress(np.ascontiguousarray(tile).tobytes(), 6)
+            offsets.append(f.tell())
+            byte_counts.append(len(data))
+            f.write(data)
+
+        # Arrays that don't fit in an entry's 8 bytes are stored before the directory,
+        # a single tile's offset and byte count go in the entries themselves
+        if len(offsets) == 1:
+            offsets_value = struct.pack('<Q', offsets[0])
+            byte_counts_value = struct.pack('<Q', byte_counts[0])
+        else:
+            offsets_value = struct.pack('<Q', f.tell())
+            f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+            byte_counts_value = struct.pack('<Q', f.tell())
+            f.write(struct.pack(f'<{len(byte_counts)}Q', *byte_counts))
+
+        short, long, long8 = 3, 4, 16
+        entries = [
+            (256, long, 1, struct.pack('<I', width)),  # ImageWidth
+            (257, long, 1, struct.pack('<I', height)),  # ImageLength
+            (258, short, 3, struct.pack('<HHH', 8, 8, 8)),  # BitsPerSample
+            (259, short, 1, struct.pack('<H', 8)),  # Compression: deflate
+            (262, short, 1, struct.pack('<H', 2)),  # PhotometricInterpretation: RGB
+            (277, short, 1, struct.pack('<H', 3)),  # SamplesPerPixel
+            (284, short, 1, struct.pack('<H', 1)),  # PlanarConfiguration: interleaved
+            (322, long, 1, struct.pack('<I', tile_size)),  # TileWidth
+            (323, long, 1, struct.pack('<I', tile_size)),  # TileLength
+            (324, long8, len(offsets), offsets_value),  # TileOffsets
+            (325, long8, len(byte_counts), byte_counts_value),  # TileByteCounts
+        ]
+        # A single value is stored in the entry itself, several as an offset to them
+        directory_at = f.tell()
+        f.write(struct.pack('<Q', len(entries)))
+        for tag, kind, count, value in entries:
+            f.write(struct.pack('<HHQ', tag, kind, count) + value.ljust(8, b'\0'))
+        f.write(struct.pack('<Q', 0))
+
+        f.seek(8)
+        f.write(struct.pack('<Q', directory_at))
+
+
+def export_poster(cells: List[GridCell], sources: List[str], size: Tuple[int, int],
+                  path: str, cache: Optional[ImageCache] = None, tile_size: int = TILE_SIZE):
+    """
+    Render a poster tile by tile into a .tif/.tiff (tiled BigTIFF) or .png file
+
+    cells must be in the output's coordinates (see poster_batch.scale_cells),
+    sources come from image_sources(); the export itself doesn't use the
+    dataset, so it can run on any thread.
+    Without a cache, one with a 256 MB budget is used for the decoded images.
+    """
+    if tile_size % 16:
+        raise ValueError("tile_size must be a multiple of 16")
+    if cache is None:
+        cache = ImageCache(256 * 1024 * 1024)
+    width, height = size
+    extension = os.path.splitext(path)[1].lower()
+
+    def region(x, y, w, h):
+        return render_region(cells, sources, size, cache, x, y, w, h)
+
+    tmp_path = path + '.tmp'
+    if extension in ('.tif', '.tiff'):
+        tiles = (region(x, y, min(tile_size, width - x), min(tile_size, height - y))
+                 for y in range(0, height, tile_size) for x in range(0, width, tile_size))
+        write_bigtiff(tmp_path, size, tiles, tile_size)
+    elif extension == '.png':
+        bands = (region(0, y, width, min(tile_size, height - y)) for y in range(0, height, tile_size))
+        write_png(tmp_path, size, bands)
+    else:
+        raise ValueError(f"Unsupported export format {extension}, use .tif, .tiff or .png")
+    os.replace(tmp_path, path)  # never leave a half-written poster
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export a poster at print resolution, tile by tile")
+    parser.add_argument('--dataset', default=os.path.join(here, 'anime_dataset'), help="dataset root")
+    parser.add_argument('--metadata', default=os.path.join(here, 'metadata.json'),
+                        help="metadata.json or anime_index.db")
+    parser.add_argument('--output', required=True, help=".tif/.tiff (tiled BigTIFF) or .png file")
+    parser.add_argument('--size', type=int, nargs=2, default=(20000, 20000), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--complexity', type=float, default=0.7)
+    parser.add_argument('--tile', type=int, default=TILE_SIZE, help="tile size in pixels, a multiple of 16")
+    parser.add_argument('--cache-mb', type=int, default=256, help="decoded image cache")
+    args = parser.parse_args()
+
+    size = tuple(args.size)
+    dataset = AnimeDataset(args.dataset, args.metadata)
+    cells, images = generate_poster(dataset, args.seed, size, args.complexity)
+    cells = scale_cells(cells, layout_size(size), size)
+    start = time.perf_counter()
+    export_poster(cells, image_sources(dataset, cells, images), size, args.output,
+                  ImageCache(args.cache_mb * 1024 * 1024), args.tile)
+    print(f"Poster {args.seed} exported to {args.output} ({time.perf_counter() - start:.1f} s)")
@@ -0,0 +1,205 @@
+"""
+Poster layouts, independent of any GUI
+
+Shared by the poster window (anime_poster_viz_final.py) and the headless
+batch renderer (poster_batch.py).
+
+A poster is determined by its seed: generate_layout() draws the layout and
+the images from a random.Random(seed) of its own, so the same seed, canvas
+size, complexity and dataset always give the same poster, and a LayoutCache
+keeps generated posters under a key made of exactly those.
+"""
+import hashlib
+import json
+import os
+import random
+from typing import List, Optional, Tuple
+
+
+class GridCell:
+    """Represents a cell in the poster grid with position and size information"""
+    def __init__(self, x, y, width, height, weight=1.0):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.weight = weight  # Importance weight for the image
+
+class PosterLayoutGenerator:
+    
+    def __init__(self, canvas_width, canvas_height, min_cell_width=0.2, min_cell_height=0.2):
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.min_cell_width_frac = min_cell_width
+        self.min_cell_height_frac = min_cell_height
+        
+    def generate_variable_grid(self, complexity=0.5, rng=None):
+        # Draws from rng (a random.Random) if given, else from the random module
+        if rng is None:
+            rng = random
+        
+        min_cell_width = int(self.canvas_width * self.min_cell_width_frac)
+        min_cell_height = int(self.canvas_height * self.min_cell_height_frac)
+        
+        cells = [GridCell(0, 0, self.canvas_width, self.canvas_height)]
+        
+        num_splits = int(5 + complexity * 15)
+        
+        for _ in range(num_splits):
+            if not cells:
+                break
+                
+            cell_weights = [cell.width * cell.height for cell in cells]
+            cell_index = rng.choices(range(len(cells)), weights=cell_weights)[0]
+            cell = cells.pop(cell_index)
+            
+            if cell.width >= cell.height:
+                split_horizontal = True
+            elif cell.width < cell.height:
+                split_horizontal = False
+            
+            if split_horizontal and cell.width < min_cell_width * 2:
+                cells.append(cell)  # Put it back
+                continue
+            elif not split_horizontal and cell.height < min_cell_height * 2:
+                cells.append(cell)  # Put it back
+                continue
+            
+            margin = 0.3
+            if split_horizontal:
+                min_split = int(cell.width * margin)
+                max_split = int(cell.width * (1 - margin))
+                if max_split <= min_split:
+                    split_pos = cell.width // 2
+                else:
+                    split_pos = rng.randint(min_split, max_split)
+                    
+                cells.append(GridCell(cell.x, cell.y, split_pos, cell.height))
+                cells.append(GridCell(cell.x + split_pos, cell.y, cell.width - split_pos, cell.height))
+            else:
+                min_split = int(cell.height * margin)
+                max_split = int(cell.height * (1 - margin))
+                if max_split <= min_split:
+                    split_pos = cell.height // 2
+                else:
+                    split_pos = rng.randint(min_split, max_split)
+                    
+                cells.append(GridCell(cell.x, cell.y, cell.width, split_pos))
+                cells.append(GridCell(cell.x, cell.y + split_pos, cell.width, cell.height - split_pos))
+            
+        return cells
+
+
+def assign_images(dataset, num_cells, rng=None):
+    """
+    Random (anime, image path) for each of num_cells cells, sometimes all from the same anime
+
+    Draws from rng (a random.Random) if given, else from the random module.
+    """
+    if rng is None:
+        rng = random
+    images = []
+    
+    use_same_anime = rng.random() < 0.3
+    
+    # Get random anime images
+    try:
+        if use_same_anime:
+            anime_list = dataset.get_anime_list()
+            for anime in rng.sample(anime_list, len(anime_list)):
+                all_images = dataset.get_anime_image_paths(anime)
+                if len(all_images) >= num_cells:
+                    selected_images = rng.sample(all_images, num_cells)
+                    images = [(anime, path) for path in selected_images]
+                    break
+            
+            if not images:
+                use_same_anime = False
+        
+        if not use_same_anime:
+            anime_list = dataset.get_anime_list()
+            for _ in range(num_cells):
+                anime = rng.choice(anime_list)
+                image_path = dataset.get_random_anime_image(anime, rng)
+                images.append((anime, image_path))
+    
+    except ValueError as e:
+        print(f"Warning: {e}. Falling back to mixed anime selection.")
+        anime_list = dataset.get_anime_list()
+        for _ in range(num_cells):
+            anime = rng.choice(anime_list)
+            image_path = dataset.get_random_anime_image(anime, rng)
+            images.append((anime, image_path))
+            
+    return images
+
+
+def poster_key(seed: int, canvas_size: Tuple[int, int], complexity: float, dataset_version: str) -> str:
+    """Content address of a poster: a hash of everything that determines it"""
+    key = json.dumps([seed, list(canvas_size), complexity, dataset_version])
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+class LayoutCache:
+    """
+    Generated posters (cells and images) by poster_key
+
+    Kept in memory and, with a directory, as one small JSON file per poster
+    so they survive restarts. The fitted tiles need no cache of their own
+    here: their image_loader cache keys (image, cell size) follow from the
+    cached layout, so a cached poster finds its tiles there as well.
+    """
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.posters = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[List[GridCell], List[Tuple[str, str]]]]:
+        poster = self.posters.get(key)
+        if poster is None and self.directory is not None:
+            try:
+                with open(self._path(key), 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+            poster = ([GridCell(*cell) for cell in data["cells"]],
+                      [tuple(image) for image in data["images"]])
+            self.posters[key] = poster
+        return poster
+
+    def put(self, key: str, cells: List[GridCell], images: List[Tuple[str, str]]):
+        self.posters[key] = (cells, images)
+        if self.directory is None:
+            return
+        data = {
+            "cells": [[cell.x, cell.y, cell.width, cell.height, cell.weight] for cell in cells],
+            "images": [list(image) for image in images],
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write the layout cache: {e}")
+
+
+def generate_layout(dataset, seed: int, canvas_size: Tuple[int, int], complexity: float = 0.7,
+                    cache: Optional[LayoutCache] = None) -> Tuple[List[GridCell], List[Tuple[str, str]]]:
+    """Variable grid cells on a canvas and their (anime, image path) for a seed, from the cache if possible"""
+    key = None
+    if cache is not None:
+        key = poster_key(seed, canvas_size, complexity, dataset.version())
+        poster = cache.get(key)
+        if poster is not None:
+            return poster
+
+    rng = random.Random(seed)
+    cells = PosterLayoutGenerator(*canvas_size).generate_variable_grid(complexity, rng)
+    images = assign_images(dataset, len(cells), rng)
+    if cache is not None:
+        cache.put(key, cells, images)
+    return cells, images
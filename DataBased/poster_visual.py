@@ -0,0 +1,156 @@
+import time
+import numpy as np
+from vispy import gloo, scene, visuals
+
+# Every cell is a quad textured from its region of one poster-sized texture,
+# so the whole poster is a single draw call whatever the number of cells.
+# The pulse animation (the quads breathing about their cell's centre) is
+# evaluated here from a clock uniform: animating costs one uniform per frame.
+VERTEX_SHADER = """
+attribute vec2 a_position;  // corner of the tile, in poster pixels
+attribute vec2 a_center;    // centre of the tile's cell
+attribute vec2 a_texcoord;
+attribute vec4 a_bounds;    // texel centres at the tile's edges (min x, min y, max x, max y)
+
+uniform float u_time;       // seconds since the pulse was (re)started
+uniform float u_phase;      // pulse phase at u_time = 0, in cycles
+uniform float u_frequency;  // pulses per second
+uniform float u_amplitude;  // extra scale at the top of a pulse
+
+varying vec2 v_texcoord;
+varying vec4 v_bounds;
+
+void main() {
+    v_texcoord = a_texcoord;
+    v_bounds = a_bounds;
+    float pulse = 0.5 + 0.5 * sin(6.28318530718 * (u_phase + u_frequency * u_time));
+    float scale = 1.0 + u_amplitude * pulse;
+    vec2 position = a_center + (a_position - a_center) * scale;
+    gl_Position = $transform(vec4(position, 0.0, 1.0));
+}
+"""
+
+FRAGMENT_SHADER = """
+uniform sampler2D u_texture;
+
+varying vec2 v_texcoord;
+varying vec4 v_bounds;
+
+void main() {
+    // Clamped so linear filtering doesn't bleed in the neighbouring tiles of the texture
+    gl_FragColor = texture2D(u_texture, clamp(v_texcoord, v_bounds.xy, v_bounds.zw));
+}
+"""
+
+# Two triangles per quad, as (x, y) corner offsets in units of the tile size
+QUAD_CORNERS = np.array([[0, 0], [1, 0], [1, 1], [0, 0], [1, 1], [0, 1]], dtype=np.float32)
+
+
+class PosterVisual(visuals.Visual):
+    """
+    All the tiles of a poster in one texture, drawn with one draw call
+
+    set_tiles() writes each tile into its cell's region of the texture (a
+    sub-region upload), skipping the cells whose rectangle and tile are the
+    same as in the previous poster, and rebuilds the small vertex buffer.
+    Cells must not overlap, as each owns its region of the texture. Tiles
+    are RGB arrays already flipped for vispy (row 0 at the bottom), as
+    returned by image_loader.load_and_fit_image.
+    """
+    def __init__(self, size):
+        visuals.Visual.__init__(self, vcode=VERTEX_SHADER, fcode=FRAGMENT_SHADER)
+        self._draw_mode = 'triangles'
+        self.set_gl_state('translucent', depth_test=False)
+        self.size = size
+        self._texture = gloo.Texture2D(
+            np.zeros((size[1], size[0], 3), dtype=np.uint8), interpolation='linear'
+        )
+        self.shared_program['u_texture'] = self._texture
+        self.set_pulse(0.0, 0.0, phase=0.0)
+        self._placed = {}  # (x, y, width, height) of a cell -> the tile uploaded there
+        self._n_vertices = 0
+        self.uploaded_tiles = 0
+
+    def set_tiles(self, cells, tiles):
+        """Show tiles[i] at cells[i] (None: leave the cell empty), replacing the previous poster"""
+        width, height = self.size
+        placed = {}
+        vertices = []
+        for cell, tile in zip(cells, tiles):
+            if tile is None:
+                continue
+            # Clip tiles that would stick out of the poster
+            visible = tile[:max(height - cell.y, 0), :max(width - cell.x, 0)]
+            tile_height, tile_width = visible.shape[:2]
+            if tile_width == 0 or tile_height == 0:
+                continue
+
+            key = (cell.x, cell.y, cell.width, cell.height)
+            if self._placed.get(key) is not tile:
+                self._texture.set_data(np.ascontiguousarray(visible), offset=(cell.y, cell.x))
+                self.uploaded_tiles += 1
+            placed[key] = tile
+
+            corners = QUAD_CORNERS * (tile_width, tile_height) + (cell.x, cell.y)
+            center = np.broadcast_to(
+                (cell.x + cell.width / 2, cell.y + cell.height / 2), corners.shape
+            )
+            bounds = np.broadcast_to((
+                (cell.x + 0.5) / width, (cell.y + 0.5) / height,
+                (cell.x + tile_width - 0.5) / width, (cell.y + tile_height - 0.5) / height
+            ), (len(corners), 4))
+            vertices.append(np.hstack([corners, center, corners / (width, height), bounds]))
+        self._placed = placed
+
+        self._n_vertices = len(vertices) * len(QUAD_CORNERS)
+        if vertices:
+            # Drawn last to first, so earlier cells stay on top where pulsing tiles overlap
+            data = np.vstack(vertices[::-1]).astype(np.float32)
+            self.shared_program['a_position'] = gloo.VertexBuffer(np.ascontiguousarray(data[:, 0:2]))
+            self.shared_program['a_center'] = gloo.VertexBuffer(np.ascontiguousarray(data[:, 2:4]))
+            self.shared_program['a_texcoord'] = gloo.VertexBuffer(np.ascontiguousarray(data[:, 4:6]))
+            self.shared_program['a_bounds'] = gloo.VertexBuffer(np.ascontiguousarray(data[:, 6:10]))
+        self.update()
+
+    def set_pulse(self, frequency: float, amplitude: float, phase=None):
+        """
+        Pulse every tile about its cell's centre, between scale 1 and 1 + amplitude
+
+        The pulse carries on from its current phase unless one is given (in cycles).
+        """
+        if phase is None:
+            phase = self.pulse_phase
+        self._pulse_start = time.perf_counter()
+        self._elapsed = 0.0
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self._phase = phase % 1.0
+        self.shared_program['u_time'] = 0.0
+        self.shared_program['u_phase'] = self._phase
+        self.shared_program['u_frequency'] = float(frequency)
+        self.shared_program['u_amplitude'] = float(amplitude)
+        self.update()
+
+    @property
+    def pulse_phase(self) -> float:
+        """Phase of the pulse as last drawn, in cycles"""
+        return self._phase + self.frequency * self._elapsed
+
+    def tick(self):
+        """Advance the pulse to the current time; the only per-frame work of the animation"""
+        self._elapsed = time.perf_counter() - self._pulse_start
+        if self.frequency * self._elapsed > 1000.0:
+            # Restart the clock before the shader's float precision runs out
+            self.set_pulse(self.frequency, self.amplitude)
+        self.shared_program['u_time'] = self._elapsed
+        self.update()
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view):
+        # Nothing to draw before the first tiles arrive
+        return self._n_vertices > 0
+
+
+Poster = scene.visuals.create_visual_node(PosterVisual)
@@ -0,0 +1,40 @@
+"""
+Round trips of poster_export.export_poster through OpenCV
+
+Run with: python -m pytest test_poster_export.py
+"""
+import cv2
+import numpy as np
+import pytest
+
+from poster_export import export_poster, render_region
+from poster_layout import GridCell
+
+
+def _poster(tmp_path, size):
+    """Two cells side by side, each showing its own gradient image"""
+    width, height = size
+    cells = [GridCell(0, 0, width // 2, height), GridCell(width // 2, 0, width - width // 2, height)]
+    sources = []
+    for i, cell in enumerate(cells):
+        image = np.zeros((cell.height, cell.width, 3), dtype=np.uint8)
+        image[..., 0] = np.linspace(0, 255, cell.width, dtype=np.uint8)
+        image[..., 1] = np.linspace(0, 255, cell.height, dtype=np.uint8)[:, None]
+        image[..., 2] = 80 * (i + 1)
+        source = str(tmp_path / f'image_{i}.png')
+        cv2.imwrite(source, image[..., ::-1])
+        sources.append(source)
+    return cells, sources
+
+
+@pytest.mark.parametrize('extension', ['.tif', '.png'])
+@pytest.mark.parametrize('size', [(1000, 1000), (2500, 2000)], ids=['single_tile', 'multi_tile'])
+def test_export_round_trip(tmp_path, size, extension):
+    cells, sources = _poster(tmp_path, size)
+    path = str(tmp_path / f'poster{extension}')
+    export_poster(cells, sources, size, path)
+
+    exported = cv2.imread(path)
+    assert exported is not None
+    expected = render_region(cells, sources, size, None, 0, 0, *size)
+    np.testing.assert_array_equal(exported[..., ::-1], expected)